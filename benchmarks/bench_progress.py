@@ -0,0 +1,219 @@
+"""
+Load-test the progress bar engine with a fake Bot on a virtual clock.
+
+Runs N concurrent scheduled posts through the real code path
+(run_progress, or resume_jobs for --scenario resume) and reports API
+throughput, CPU time, peak RSS, event-loop lag and publish skew. Each size
+runs in its own subprocess so peak RSS is not shared between sizes.
+
+    python benchmarks/bench_progress.py
+    python benchmarks/bench_progress.py --jobs 1000 --scenario resume --retry-after-rate 0.01
+    python benchmarks/bench_progress.py --jobs 1000 --channels 5 --dashboard
+    python benchmarks/bench_progress.py --jobs 1000 --users 20 --heavy-share 0.9
+
+With --heavy-share, user 0 owns that share of the posts, all with the
+shortest countdown (a bulk schedule due at once), and publish skew is also
+reported for the other ("light") users alone.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bot  # noqa: E402
+from i18n import get_translator  # noqa: E402
+from fake_bot import FakeBot  # noqa: E402
+from virtual_clock import VirtualClockLoop  # noqa: E402
+
+
+async def _seed_active_jobs(args, rnd: random.Random, channels: list) -> None:
+    """Insert jobs as a previous run would have left them, some already overdue."""
+    now = time.time()
+    inserts = []
+    for i in range(args.jobs):
+        duration = rnd.uniform(args.min_duration, args.max_duration)
+        start_time = now - rnd.uniform(0, duration * 1.1)
+        inserts.append(bot.STORE.add_job(rnd.choice(channels), i + 1, f"post {i}", None, duration, start_time))
+    await asyncio.gather(*inserts)
+
+
+async def _wait_until_drained(fake: FakeBot) -> None:
+    quiet = 0
+    while quiet < 2:
+        await asyncio.sleep(1)
+        busy = len(bot.REGISTRY) or len(bot.OUTBOUND) or fake.in_flight
+        if not busy:
+            # Posts waiting in the outbox for a retry
+            busy, = await bot.STORE.fetchone("SELECT COUNT(*) FROM jobs WHERE status = 'publishing'")
+        quiet = 0 if busy else quiet + 1
+
+
+async def run_scenario(args) -> dict:
+    loop = asyncio.get_running_loop()
+    rnd = random.Random(args.seed)
+    channels = [-1000000000000 - i for i in range(args.channels)]
+    fake = FakeBot(args.latency, error_rate=args.error_rate,
+                   retry_after_rate=args.retry_after_rate, seed=args.seed)
+
+    workdir = tempfile.mkdtemp(prefix='progress-bench-')
+    bot.T = get_translator('en')
+    bot.STORE = bot.JobStore(os.path.join(workdir, 'jobs.db'))
+    await bot.STORE.open()
+    bot.SCHEDULER = bot.ShardedScheduler(bot.progress_tick)
+    bot.CAPABILITIES = bot.CapabilityCache(fake, bot.CAPABILITY_TTL, bot.CAPABILITY_RETRY_TTL)
+    bot.OUTBOUND = bot.OutboundQueue(fake, bot.GLOBAL_RATE, bot.CHAT_RATE, bot.CHAT_BURST,
+                                   feedback=bot.CADENCE.record, on_error=bot.CAPABILITIES.on_error,
+                                   tenant_weights=bot.USER_WEIGHTS)
+    bot.OUTBOUND.start()
+    bot.SCHEDULER.start()
+    outbox = asyncio.create_task(bot.drain_outbox())
+    if args.dashboard:
+        bot.DASHBOARDS = bot.DashboardManager(bot.OUTBOUND, bot.STORE, bot.render_dashboard_line,
+                                              bot.T.dashboard_header, bot.DASHBOARD_INTERVAL)
+        bot.DASHBOARDS.start()
+
+    if args.scenario == 'resume':
+        await _seed_active_jobs(args, rnd, channels)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    virtual_start = loop.time()
+
+    if args.scenario == 'resume':
+        await bot.resume_jobs()
+        await asyncio.gather(*bot.STARTING.values(), return_exceptions=True)  # Bars are sent in the background
+    else:
+        posts = []
+        for i in range(args.jobs):
+            if rnd.random() < args.heavy_share:
+                user_id, duration = 0, args.min_duration
+            else:
+                user_id = rnd.randrange(1, args.users) if args.users > 1 else 0
+                duration = rnd.uniform(args.min_duration, args.max_duration)
+            posts.append(bot.run_progress(rnd.choice(channels), f"post {i}", None, duration, user_id=user_id))
+        await asyncio.gather(*posts)
+    setup_wall = time.perf_counter() - wall_start
+    jobs = list(bot.REGISTRY)
+
+    await _wait_until_drained(fake)
+
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    virtual = loop.time() - virtual_start
+    published, = await bot.STORE.fetchone("SELECT COUNT(*) FROM jobs WHERE status = 'published'")
+    outbox.cancel()
+    if bot.DASHBOARDS is not None:
+        await bot.DASHBOARDS.stop()
+    await bot.SCHEDULER.stop()
+    await bot.OUTBOUND.stop()
+    await bot.STORE.close()
+
+    skews = sorted(job.publish_skew for job in jobs if job.publish_skew is not None)
+    light = sorted(job.publish_skew for job in jobs if job.publish_skew is not None and job.user_id)
+    edits = fake.calls['edit_message_text']
+    api_calls = sum(fake.calls.values())
+    return {
+        'scenario': args.scenario,
+        'jobs': args.jobs,
+        'channels': args.channels,
+        'virtual_s': round(virtual, 1),
+        'wall_s': round(wall, 2),
+        'setup_wall_s': round(setup_wall, 2),
+        'cpu_s': round(cpu, 2),
+        'edits': edits,
+        'edits_per_s': round(edits / virtual, 1) if virtual else 0.0,
+        'api_calls_per_cpu_s': round(api_calls / cpu, 1) if cpu else 0.0,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'loop_lag_p99_ms': round(loop.lag_percentile(99) * 1000, 2),
+        'loop_lag_max_ms': round(loop.lag_max * 1000, 2),
+        'skew_p50_s': round(statistics.median(skews), 3) if skews else None,
+        'skew_p99_s': round(skews[int(len(skews) * 0.99) - 1], 3) if skews else None,
+        'skew_max_s': round(skews[-1], 3) if skews else None,
+        'light_skew_p99_s': round(light[int(len(light) * 0.99) - 1], 3) if args.heavy_share and light else None,
+        'light_skew_max_s': round(light[-1], 3) if args.heavy_share and light else None,
+        'published': published,
+        'failures': dict(fake.failures),
+    }
+
+
+def run_in_process(args) -> dict:
+    loop = VirtualClockLoop()
+    asyncio.set_event_loop(loop)
+    real_time, time.time = time.time, loop.wall_time
+    try:
+        return loop.run_until_complete(run_scenario(args))
+    finally:
+        time.time = real_time
+        loop.close()
+
+
+def run_in_subprocess(args, jobs: int) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), '--json', '--jobs', str(jobs),
+           '--scenario', args.scenario, '--channels', str(args.channels),
+           '--min-duration', str(args.min_duration), '--max-duration', str(args.max_duration),
+           '--latency', str(args.latency), '--error-rate', str(args.error_rate),
+           '--retry-after-rate', str(args.retry_after_rate), '--seed', str(args.seed)]
+    if args.dashboard:
+        cmd.append('--dashboard')
+    if args.heavy_share:
+        cmd += ['--users', str(args.users), '--heavy-share', str(args.heavy_share)]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def print_table(results: list) -> None:
+    columns = ['jobs', 'virtual_s', 'wall_s', 'cpu_s', 'edits_per_s', 'api_calls_per_cpu_s',
+               'peak_rss_mb', 'loop_lag_p99_ms', 'loop_lag_max_ms', 'skew_p50_s', 'skew_p99_s',
+               'skew_max_s', 'published']
+    if any(r['light_skew_p99_s'] is not None for r in results):
+        columns[-1:-1] = ['light_skew_p99_s', 'light_skew_max_s']
+    widths = [max(len(c), *(len(str(r[c])) for r in results)) for c in columns]
+    print('  '.join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in results:
+        print('  '.join(str(r[c]).rjust(w) for c, w in zip(columns, widths)))
+    for r in results:
+        if r['failures']:
+            print(f"{r['jobs']} jobs, injected failures: {r['failures']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Progress bar engine load test')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[100, 1000, 10000], help='Concurrent posts per run')
+    parser.add_argument('--scenario', choices=['run', 'resume'], default='run', help='Schedule new posts or resume stored ones')
+    parser.add_argument('--channels', type=int, default=100, help='Channels the posts are spread over')
+    parser.add_argument('--min-duration', type=float, default=60, help='Shortest countdown, seconds')
+    parser.add_argument('--max-duration', type=float, default=600, help='Longest countdown, seconds')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean fake API latency, seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API calls failing with NetworkError')
+    parser.add_argument('--retry-after-rate', type=float, default=0.0, help='Share of API calls failing with RetryAfter')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dashboard', action='store_true', help='Show bars on one dashboard message per channel')
+    parser.add_argument('--users', type=int, default=1, help='Users the posts are scheduled by')
+    parser.add_argument('--heavy-share', type=float, default=0.0,
+                        help='Share of posts bulk-scheduled by user 0 with the shortest countdown (run scenario)')
+    parser.add_argument('--json', action='store_true', help='Print a single JSON result line')
+    parser.add_argument('--verbose', action='store_true', help='Show bot log output')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    if len(args.jobs) == 1:
+        args.jobs = args.jobs[0]
+        result = run_in_process(args)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_table([result])
+    else:
+        print_table([run_in_subprocess(args, jobs) for jobs in args.jobs])
@@ -0,0 +1,74 @@
+import asyncio
+import itertools
+import random
+from collections import Counter
+
+from telegram.error import NetworkError, RetryAfter
+
+
+class FakeMessage:
+    def __init__(self, chat_id, message_id: int):
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+
+class FakeBot:
+    """
+    Local stand-in for telegram.Bot covering the calls the scheduler makes.
+
+    Every call sleeps for a random latency on the running loop (so it obeys
+    the virtual clock) and may fail with a NetworkError or a RetryAfter at
+    the configured rates. Calls, failures and in-flight requests are counted.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.5, error_rate: float = 0.0,
+                 retry_after_rate: float = 0.0, retry_after: int = 3, seed: int = 0):
+        self.id = 1
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.failures = Counter()
+        self.in_flight = 0
+        self.publish_times = []
+        self._random = random.Random(seed)
+        self._message_ids = itertools.count(1)
+
+    async def _call(self, kind: str) -> None:
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency * (1 + self.jitter * (self._random.random() * 2 - 1)))
+            roll = self._random.random()
+            if roll < self.retry_after_rate:
+                self.failures['retry_after'] += 1
+                raise RetryAfter(self.retry_after)
+            if roll < self.retry_after_rate + self.error_rate:
+                self.failures[kind] += 1
+                raise NetworkError("injected failure")
+            self.calls[kind] += 1
+        finally:
+            self.in_flight -= 1
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call('send_message')
+        self.publish_times.append(asyncio.get_running_loop().time())
+        return FakeMessage(chat_id, next(self._message_ids))
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        await self._call('send_photo')
+        self.publish_times.append(asyncio.get_running_loop().time())
+        return FakeMessage(chat_id, next(self._message_ids))
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        await self._call('edit_message_text')
+        return True
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        await self._call('delete_message')
+        return True
+
+    async def pin_chat_message(self, chat_id, message_id, **kwargs):
+        await self._call('pin_chat_message')
+        return True
@@ -0,0 +1,84 @@
+import asyncio
+import selectors
+import time
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Selector that jumps the loop's virtual clock instead of sleeping."""
+
+    loop = None
+
+    def select(self, timeout=None):
+        loop = self.loop
+        loop._record_busy()
+        if timeout is None or timeout <= 0 or loop.executor_pending:
+            # Nothing scheduled, or a worker thread is busy: wait for real I/O
+            events = super().select(timeout)
+        else:
+            events = super().select(0)
+            if not events:
+                loop.virtual_now += timeout
+        loop._busy_since = time.perf_counter()
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop whose time() is virtual: whenever the loop would sleep until
+    the next timer, the clock jumps forward instead. Real time spent running
+    callbacks is charged to the virtual clock too, so a slow loop shows up
+    as publish skew just like in production. Thread-pool work (the job
+    store) is awaited in real time, but costs no virtual time.
+
+    Event-loop lag is the real time spent running callbacks between two
+    selector polls, kept as a power-of-two histogram in microseconds.
+    """
+
+    def __init__(self):
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self.virtual_now = 0.0
+        self._epoch = time.time()
+        self.executor_pending = 0
+        self.lag_histogram = [0] * 32
+        self.lag_max = 0.0
+        self._busy_since = None
+
+    def time(self) -> float:
+        return self.virtual_now
+
+    def wall_time(self) -> float:
+        """Stand-in for time.time() that advances with the virtual clock (for leases and retry times)."""
+        return self._epoch + self.virtual_now
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.executor_pending += 1
+        future.add_done_callback(self._executor_done)
+        return future
+
+    def _executor_done(self, _future) -> None:
+        self.executor_pending -= 1
+
+    def _record_busy(self) -> None:
+        if self._busy_since is None:
+            return
+        busy = time.perf_counter() - self._busy_since
+        self.virtual_now += busy
+        self.lag_max = max(self.lag_max, busy)
+        bucket = min(int(busy * 1e6).bit_length(), len(self.lag_histogram) - 1)
+        self.lag_histogram[bucket] += 1
+
+    def lag_percentile(self, pct: float) -> float:
+        """Upper bound (seconds) of the histogram bucket holding the given percentile."""
+        total = sum(self.lag_histogram)
+        if not total:
+            return 0.0
+        threshold = total * pct / 100
+        seen = 0
+        for bucket, count in enumerate(self.lag_histogram):
+            seen += count
+            if seen >= threshold:
+                return (1 << bucket) / 1e6
+        return self.lag_max
@@ -2,12 +2,18 @@ import os
 import math
 import asyncio
 import logging
-import sqlite3
 import time
-import json
+import random
+import socket
 import argparse
+import datetime
+import functools
+import zoneinfo
+import importlib.util
+import httpx
 from dotenv import load_dotenv
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest, Forbidden
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -17,36 +23,20 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
+from telegram.request import HTTPXRequest
 from i18n import get_translator
-
-# =====================
-# Database Setup
-# =====================
-DB_FILE = 'jobs.db'
-
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id INTEGER NOT NULL,
-            message_id INTEGER NOT NULL,
-            post_text TEXT,
-            media TEXT,
-            duration INTEGER NOT NULL,
-            start_time INTEGER NOT NULL,
-            status TEXT DEFAULT 'active'
-        )
-    ''')
-    # Ensure the status column exists for older DBs
-    cursor.execute("PRAGMA table_info(jobs)")
-    cols = [r[1] for r in cursor.fetchall()]
-    if 'status' not in cols:
-        cursor.execute("ALTER TABLE jobs ADD COLUMN status TEXT DEFAULT 'active'")
-    conn.commit()
-    conn.close()
-
+from jobs import ProgressJob, JobRegistry
+from cadence import CadenceController
+from capabilities import CapabilityCache
+from dashboard import DashboardManager
+from outbound import OutboundQueue, PRIORITY_PUBLISH, PRIORITY_DELETE, PRIORITY_SEND
+from scheduler import ShardedScheduler
+from store import JobStore
+from httpserver import HTTPServer
+from webhook import make_webhook_handler
+from importer import MAX_IMPORT_BYTES, parse_import
+from recurrence import parse_recurrence
+import metrics
 
 # =====================
 # Configuration Settings
@@ -54,18 +44,121 @@ def init_db():
 # Load environment variables from .env file
 load_dotenv()
 
+
+def parse_chat_id(value: str):
+    """Numeric chat IDs become ints (as stored in the DB); @usernames stay strings."""
+    value = value.strip()
+    return int(value) if value.lstrip('-').isdigit() else value
+
+
+def parse_user_weights(value: str) -> dict:
+    """``user_id:weight`` pairs, comma-separated, e.g. ``12345:3,67890:0.5``."""
+    weights = {}
+    for pair in value.split(','):
+        if pair.strip():
+            user_id, weight = pair.split(':')
+            weight = float(weight)
+            if not weight > 0:
+                raise ValueError(f"USER_WEIGHTS: weight of user {user_id.strip()} must be positive, got {weight:g}")
+            weights[int(user_id)] = weight
+    return weights
+
+
+DB_FILE = 'jobs.db'
+
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 CHANNEL_ID = os.getenv('CHANNEL_ID')
+# Optional comma-separated list of channels served by this bot; CHANNEL_ID is the default
+CHANNEL_IDS = os.getenv('CHANNEL_IDS') or CHANNEL_ID or ''
+CHANNELS = [parse_chat_id(c) for c in CHANNEL_IDS.split(',') if c.strip()]
+CHANNEL_ID = parse_chat_id(CHANNEL_ID) if CHANNEL_ID else (CHANNELS[0] if CHANNELS else None)
 # Progress bar settings
 BAR_LENGTH = 20              # Total characters in the progress bar
 DESIRED_INTERVAL = 6.0       # Desired seconds between edits
 DELETE_DELAY = 1          # Seconds to wait before deleting final post
+RESUME_PAGE_SIZE = 500       # Active jobs claimed per query when resuming or taking over jobs
+CANCEL_PAGE_SIZE = 8         # Jobs per page of the /cancel picker
+IMPORT_STAGGER = 0.2         # Seconds between starting the bars of a bulk import
+SCHEDULE_TZ = os.getenv('SCHEDULE_TZ', 'UTC')   # Time zone of daily times and cron expressions
+SCHEDULE_TZINFO = datetime.timezone.utc if SCHEDULE_TZ.upper() == 'UTC' else zoneinfo.ZoneInfo(SCHEDULE_TZ)
+# Dashboard mode: one pinned message per channel lists all its running bars instead of one message each
+DASHBOARD_MODE = os.getenv('DASHBOARD_MODE', '0').lower() in ('1', 'true', 'yes')
+DASHBOARD_INTERVAL = DESIRED_INTERVAL   # Seconds between dashboard edits
+DASHBOARD_MAX_JOBS = 20      # Bars listed per dashboard, soonest first; the rest are counted
+# Job leases: worker processes sharing jobs.db each run the jobs they hold a lease on (--role)
+WORKER_ID = os.getenv('WORKER_ID') or socket.gethostname()   # Must differ between processes sharing jobs.db
+LEASE_TTL = 60.0             # Seconds a lease holds without renewal; then other workers take the job over
+HEARTBEAT_INTERVAL = 20.0    # Seconds between lease renewals
+CLAIM_INTERVAL = 5.0         # Seconds between looking for unleased jobs (new, or from a dead worker)
+# Channel rights are looked up (get_chat_member) before scheduling and cached
+CAPABILITY_TTL = 600.0       # Seconds the rights of a usable channel are trusted
+CAPABILITY_RETRY_TTL = 60.0  # Seconds before a channel lacking rights is checked again
+# Fair sharing between users scheduling posts
+MAX_ACTIVE_JOBS_PER_USER = int(os.getenv('MAX_ACTIVE_JOBS_PER_USER', '0'))  # 0 = no cap
+USER_WEIGHTS = parse_user_weights(os.getenv('USER_WEIGHTS', ''))  # Share of API capacity per user; default 1
+# Publish outbox: due posts stay in the store until Telegram accepts them
+OUTBOX_INTERVAL = 2.0        # Seconds between looking for posts due for another attempt
+PUBLISH_RETRY_BASE = 2.0     # Delay before the first retry, doubled after each failed attempt
+PUBLISH_RETRY_MAX = 300.0    # Longest delay between attempts
+MAX_PUBLISH_ATTEMPTS = 8     # Then the post is marked failed
+# Finished jobs are moved to the jobs_history table in batches
+ARCHIVE_INTERVAL = 60        # Seconds between archive passes
+ARCHIVE_BATCH_SIZE = 500     # Rows moved (or purged) per transaction
+HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '90'))  # 0 keeps history forever
+# Webhook mode (--mode webhook)
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')   # Local address of the HTTP endpoint
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')                 # Checked against X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')                       # Public URL registered with Telegram; unset = don't register
+# Metrics and health endpoint (GET /metrics, GET /healthz); METRICS_PORT=0 disables it
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+HEALTH_MAX_OVERDUE = 30.0    # Unhealthy once a due tick has waited this long, seconds
+HEALTH_MAX_LOOP_LAG = 5.0    # Unhealthy once the event loop lags this much, seconds
+# Outbound rate limits (Bot API flood control)
+GLOBAL_RATE = 25.0           # Max API calls per second across all chats
+CHAT_RATE = 20 / 60          # Max API calls per second into one channel
+CHAT_BURST = 3               # Calls a quiet channel may burst before throttling
+CHAT_EDIT_BUDGET = 15 / 60   # Bar edits per second shared by all bars of one channel
+# Bot API connection pools, one per kind of traffic so a burst of edits can't starve the rest
+OUTBOUND_IN_FLIGHT = 16      # Concurrent bar sends/edits/deletes
+PUBLISH_IN_FLIGHT = 4        # Concurrent final publishes, on their own connections
+UPDATES_POOL = dict(size=1, timeout=10.0)                            # getUpdates (long polling)
+EDIT_POOL = dict(size=OUTBOUND_IN_FLIGHT + 4, timeout=10.0)          # Bar traffic, command replies, /check_add probes
+PUBLISH_POOL = dict(size=PUBLISH_IN_FLIGHT, timeout=30.0)            # send_message/send_photo of the final post
+KEEPALIVE_EXPIRY = 60.0      # Seconds an idle pooled connection is kept open
+# HTTP/2 multiplexes calls over fewer connections; used when the h2 package is installed
+HTTP_VERSION = '2' if importlib.util.find_spec('h2') else '1.1'
 
 # Conversation states
-POST, TIME = range(2)
+POST, TIME, CHANNEL, IMPORT, REPEAT = range(5)
 
 T = None  # Translator is set from CLI in __main__
-
+ROLE = 'all'  # Process role (--role): 'all', 'updates' (Telegram updates only) or 'worker' (jobs only)
+SCHEDULER = None  # Per-channel job schedulers, created in main()
+STORE = None  # Job store, opened in main()
+REGISTRY = JobRegistry()  # Jobs running in this process
+OUTBOUND = None  # Rate-limited queue for channel API calls, created in main()
+LAG_MONITOR = None  # Event-loop lag sampler, created in main()
+CADENCE = CadenceController(CHAT_EDIT_BUDGET)  # Splits each channel's edit budget between its bars
+DASHBOARDS = None  # Per-channel dashboard messages, created in main() in dashboard mode
+CAPABILITIES = None  # Cached bot rights per channel, created in main()
+STARTING = {}  # Job id -> task starting a stored job (claimed or imported) in the background
+PUBLISHING = set()  # Ids of outbox posts with a send in flight in this process; the outbox loop leaves them alone
+STARTED_AT = time.time()  # Jobs leased to this worker that started earlier are left over from its previous run
+
+
+
+@functools.lru_cache(maxsize=4)
+def _bar_frames(length: int) -> tuple:
+    """All 101 progress bar frames (0-100%) for a bar of ``length`` characters."""
+    frames = []
+    for percent in range(101):
+        filled = int(percent / 100 * length)
+        bar = '█' * filled + '░' * (length - filled)
+        frames.append(f'[{bar}] {percent}%')
+    return tuple(frames)
 
 
 def generate_progress_bar(progress: int) -> str:
@@ -74,10 +167,56 @@ def generate_progress_bar(progress: int) -> str:
     :param progress: Completion percentage (0-100)
     :return: Formatted progress bar string
     """
-    percent = int(progress)
-    filled = int(percent / 100 * BAR_LENGTH)
-    bar = '█' * filled + '░' * (BAR_LENGTH - filled)
-    return f'[{bar}] {percent}%'
+    percent = min(max(int(progress), 0), 100)
+    return _bar_frames(BAR_LENGTH)[percent]
+
+
+def update_progress(job: ProgressJob, now: float) -> None:
+    """Set the job's elapsed time and bar percentage for loop time ``now``."""
+    job.elapsed = min(now - (job.deadline - job.duration), job.duration)
+    job.progress = min(int(job.elapsed / job.interval + 1e-9) * job.step_pct, 100)
+
+
+def render_progress(job: ProgressJob) -> str:
+    """Text of the job's progress bar message at its current elapsed time."""
+    seconds_left = max(job.duration - job.elapsed, 0)
+    return (
+        f"{generate_progress_bar(job.progress)}\n"
+        f"{T.format_time_left(seconds_left)} {T.remaining_text}"
+    )
+
+
+def dashboard_title(post_text: str):
+    """First line of the post, shortened for its dashboard entry; None for media-only posts."""
+    title = (post_text or '').strip().split('\n', 1)[0]
+    if len(title) > 40:
+        title = title[:40] + '...'
+    return title or None
+
+
+def render_dashboard_line(job: ProgressJob) -> str:
+    """The job's entry on its channel dashboard: the start of the post, then its bar."""
+    update_progress(job, asyncio.get_running_loop().time())
+    return f"{job.title or T.media_post_label}\n{render_progress(job)}"
+
+
+def next_render_change(job: ProgressJob) -> float:
+    """
+    Elapsed time at which render_progress(job) next produces different text.
+    Bar steps land on multiples of job.interval; the time-left string changes
+    at minute or hour boundaries. Ticks are never closer than one bar step
+    apart, so a job never edits more often than its configured cadence.
+    """
+    steps_done = int(job.elapsed / job.interval + 1e-9)
+    bar_change = (steps_done + 1) * job.interval
+    time_change = job.duration - T.time_left_changes_at(job.duration - job.elapsed) + 1e-6
+    next_elapsed = max(min(bar_change, time_change), job.elapsed + job.interval)
+    return min(next_elapsed, job.duration)
+
+
+def lease_until() -> float:
+    """Wall-clock expiry of a lease taken or renewed now."""
+    return time.time() + LEASE_TTL
 
  
 
@@ -90,12 +229,20 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def run_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Entry point for /run: ask the user for the post content."""
+    context.user_data['repeat'] = False
+    await update.message.reply_text(T.run_prompt)
+    return POST
+
+
+async def repeat_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Entry point for /repeat: like /run, then ask how the post recurs."""
+    context.user_data['repeat'] = True
     await update.message.reply_text(T.run_prompt)
     return POST
 
 
 async def receive_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Store the post content or media and ask for a duration selection."""
+    """Store the post content or media and ask for the target channel or duration."""
     msg = update.message
     # Handle photo posts (with optional caption)
     if msg.photo:
@@ -107,15 +254,34 @@ async def receive_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         context.user_data['media'] = None
         context.user_data['post_text'] = msg.text or ''
 
+    if len(CHANNELS) > 1:
+        keyboard = [[InlineKeyboardButton(str(chat_id), callback_data=f"channel_{i}")]
+                    for i, chat_id in enumerate(CHANNELS)]
+        await msg.reply_text(T.channel_prompt, reply_markup=InlineKeyboardMarkup(keyboard))
+        return CHANNEL
+
+    context.user_data['chat_id'] = CHANNEL_ID
+    await msg.reply_text(T.duration_prompt, reply_markup=duration_keyboard())
+    return TIME
+
+
+async def channel_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store the target channel picked from the inline keyboard and ask for a duration."""
+    query = update.callback_query
+    await query.answer()
+    context.user_data['chat_id'] = CHANNELS[int(query.data.split("_")[1])]
+    await query.edit_message_text(T.duration_prompt, reply_markup=duration_keyboard())
+    return TIME
+
+
+def duration_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(T.min_label(1), callback_data="60"),
          InlineKeyboardButton(T.min_label(5), callback_data="300")],
         [InlineKeyboardButton(T.min_label(10), callback_data="600"),
          InlineKeyboardButton(T.custom_label, callback_data="custom")]
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await msg.reply_text(T.duration_prompt, reply_markup=reply_markup)
-    return TIME
+    return InlineKeyboardMarkup(keyboard)
 
 
 async def time_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -129,14 +295,20 @@ async def time_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     duration = int(data)
     context.user_data['duration'] = duration
+    problem = await channel_problem(context.user_data['chat_id']) or await quota_problem(update.effective_user.id)
+    if problem:
+        await query.edit_message_text(problem)
+        return ConversationHandler.END
+    if context.user_data.get('repeat'):
+        await query.edit_message_text(T.repeat_prompt, parse_mode='Markdown')
+        return REPEAT
     await query.edit_message_text(T.scheduled_in_minutes(duration // 60))
-    asyncio.create_task(
-        run_progress(
-            context.bot,
-            context.user_data['post_text'],
-            context.user_data['media'],
-            duration
-        )
+    await schedule_post(
+        context.user_data['chat_id'],
+        context.user_data['post_text'],
+        context.user_data['media'],
+        duration,
+        update.effective_user.id
     )
     return ConversationHandler.END
 
@@ -150,60 +322,323 @@ async def custom_time_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     minutes = int(text)
     duration = minutes * 60
     context.user_data['duration'] = duration
+    problem = await channel_problem(context.user_data['chat_id']) or await quota_problem(update.effective_user.id)
+    if problem:
+        await update.message.reply_text(problem)
+        return ConversationHandler.END
+    if context.user_data.get('repeat'):
+        await update.message.reply_text(T.repeat_prompt, parse_mode='Markdown')
+        return REPEAT
     await update.message.reply_text(T.scheduled_in_minutes(minutes))
-    asyncio.create_task(
-        run_progress(
-            context.bot,
-            context.user_data['post_text'],
-            context.user_data['media'],
-            duration
-        )
+    await schedule_post(
+        context.user_data['chat_id'],
+        context.user_data['post_text'],
+        context.user_data['media'],
+        duration,
+        update.effective_user.id
     )
     return ConversationHandler.END
 
 
+async def receive_recurrence(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store the post of a /repeat conversation as a recurring schedule."""
+    duration = context.user_data['duration']
+    try:
+        recurrence = parse_recurrence(update.message.text, SCHEDULE_TZINFO)
+    except ValueError as e:
+        await update.message.reply_text(T.repeat_invalid_text(str(e)))
+        return REPEAT
+    now = time.time()
+    # The first run leaves room for a full countdown
+    next_run = recurrence.next_after(now, now + duration)
+    if next_run is None:
+        await update.message.reply_text(T.repeat_invalid_text(f"'{recurrence.spec}' never runs"))
+        return REPEAT
+    await STORE.add_schedules([(context.user_data['chat_id'], context.user_data['post_text'],
+                                context.user_data['media'], duration, recurrence.spec, next_run)],
+                              update.effective_user.id)
+    await update.message.reply_text(T.repeat_created_text(recurrence.spec, format_schedule_time(next_run)))
+    return ConversationHandler.END
+
+
+def format_schedule_time(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts, SCHEDULE_TZINFO).strftime('%Y-%m-%d %H:%M')
+
+
+def next_occurrence(spec: str, previous: float, now: float):
+    """
+    Run of a stored schedule following ``previous``, not before ``now``; runs missed
+    while no worker was up are skipped. None once the schedule never runs again.
+    """
+    try:
+        return parse_recurrence(spec, SCHEDULE_TZINFO).next_after(previous, now)
+    except ValueError as e:
+        logging.error(f"Dropping schedule with invalid recurrence {spec!r}: {e}")
+        return None
+
+
+async def channel_problem(chat_id):
+    """
+    Why a bar can't run in the channel, as a message for the user; None if the bot
+    can post and edit there, or if its rights can't be checked right now.
+    """
+    capabilities = await CAPABILITIES.get(chat_id)
+    if capabilities is None or capabilities.ready:
+        return None
+    missing = [label for ok, label in ((capabilities.can_post, T.send_messages_label),
+                                       (capabilities.can_edit, T.edit_messages_label)) if not ok]
+    return T.channel_not_ready_text(chat_id, missing, capabilities.error)
+
+
+async def quota_problem(user_id: int, adding: int = 1):
+    """Why a user can't schedule ``adding`` more posts, as a message; None while under MAX_ACTIVE_JOBS_PER_USER."""
+    if not MAX_ACTIVE_JOBS_PER_USER:
+        return None
+    active = await STORE.count_active_jobs(user_id)
+    if active + adding <= MAX_ACTIVE_JOBS_PER_USER:
+        return None
+    return T.quota_exceeded_text(active, MAX_ACTIVE_JOBS_PER_USER)
+
+
+async def schedule_post(chat_id, post_text: str, media: dict, duration: float, user_id: int = None) -> None:
+    """Start a new post's bar here, or (role 'updates') store it for a worker to claim."""
+    if ROLE == 'updates':
+        await STORE.add_job(chat_id, 0, post_text, media, duration, time.time(), user_id=user_id)
+    else:
+        await run_progress(chat_id, post_text, media, duration, user_id=user_id)
+
+
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Entry point for /import: ask for a JSON or CSV file of posts."""
+    await update.message.reply_text(T.import_prompt, parse_mode='Markdown')
+    return IMPORT
+
+
+async def receive_import(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Validate an uploaded import file, store every post in one transaction and start the bars."""
+    document = update.message.document
+    if document is None:
+        await update.message.reply_text(T.import_needs_document)
+        return IMPORT
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        await update.message.reply_text(T.import_failed_text([f"file is larger than {MAX_IMPORT_BYTES // 1024} KB"]))
+        return IMPORT
+
+    file = await document.get_file()
+    data = bytes(await file.download_as_bytearray())
+    now = time.time()
+    posts, errors = parse_import(document.file_name or '', data, CHANNEL_ID, CHANNELS, parse_chat_id, now)
+    if errors:
+        await update.message.reply_text(T.import_failed_text(errors))
+        return IMPORT
+    problems = await asyncio.gather(*(channel_problem(chat_id) for chat_id in {p.chat_id for p in posts}))
+    problems = [problem for problem in problems if problem]
+    if problems:
+        await update.message.reply_text("\n".join(problems))
+        return IMPORT
+
+    # Recurring posts are stored once and expanded into one job per run
+    schedules = []
+    for post in posts:
+        if post.repeat:
+            next_run = parse_recurrence(post.repeat, SCHEDULE_TZINFO).next_after(now, now + post.duration)
+            if next_run is None:
+                errors.append(f"'{post.repeat}' never runs")
+            schedules.append((post.chat_id, post.post_text, post.media, post.duration, post.repeat, next_run))
+    if errors:
+        await update.message.reply_text(T.import_failed_text(errors))
+        return IMPORT
+    user_id = update.effective_user.id
+    once = [post for post in posts if not post.repeat]
+    problem = await quota_problem(user_id, len(once))
+    if problem:
+        await update.message.reply_text(problem)
+        return IMPORT
+    if schedules:
+        await STORE.add_schedules(schedules, user_id)
+
+    rows = [(p.chat_id, 0, p.post_text, p.media, p.duration, now) for p in once]
+    if ROLE == 'updates':
+        await STORE.add_jobs(rows, user_id=user_id)  # Workers claim them
+    elif rows:
+        job_ids = await STORE.add_jobs(rows, WORKER_ID, lease_until(), user_id)
+        start_imported_jobs(list(zip(job_ids, once)), now, user_id)
+    await update.message.reply_text(T.import_done_text(len(posts)))
+    return ConversationHandler.END
+
+
+def start_imported_jobs(jobs: list, start_time: float, user_id: int = None) -> None:
+    """
+    Start the bars of bulk-imported jobs, IMPORT_STAGGER seconds apart.
+    Progress counts from the import time; only the bar messages are spread out.
+    """
+    for number, (job_id, post) in enumerate(jobs):
+        start_job(job_id, start_imported_job(job_id, post, start_time, number * IMPORT_STAGGER, user_id))
+    logging.info(f"Starting {len(jobs)} imported jobs")
+
+
+async def start_imported_job(job_id: int, post, start_time: float, delay: float, user_id: int = None) -> None:
+    await asyncio.sleep(delay)
+    if await STORE.get_job(job_id) is None:
+        return  # Cancelled before its bar was created
+    await run_progress(post.chat_id, post.post_text, post.media, post.duration, job_id, None, start_time,
+                       user_id=user_id)
+
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Allow the user to cancel the operation."""
     await update.message.reply_text(T.cancel_op)
     return ConversationHandler.END
 
 
-async def cancel_job_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Show active jobs with inline keyboard to select which one to cancel."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, post_text, start_time, duration FROM jobs WHERE status = 'active'")
-    jobs = cursor.fetchall()
-    conn.close()
-    
-    if not jobs:
-        await update.message.reply_text(T.no_active_jobs)
-        return
-    
+def parse_cancel_filter(args: list) -> tuple:
+    """
+    /cancel arguments: a single chat id (numeric or @username) filters by channel,
+    anything else is matched as a prefix of the post text.
+    :return: (chat_id, text_prefix), either may be None
+    """
+    if not args:
+        return None, None
+    if len(args) == 1:
+        target = parse_chat_id(args[0])
+        if isinstance(target, int) or target.startswith('@'):
+            return target, None
+    return None, ' '.join(args)
+
+
+async def build_cancel_page(user_data: dict, page: int, anchor: tuple, forward: bool = True):
+    """
+    Text and keyboard of one page of the /cancel picker, or None if no job matches.
+    Only the jobs on the page are read and rendered.
+    """
+    chat_id, text_prefix = user_data.get('cancel_filter', (None, None))
+    # One extra row tells whether another page follows in the paging direction
+    rows = await STORE.page_active_jobs(anchor, CANCEL_PAGE_SIZE + 1, forward, chat_id, text_prefix)
+    more = len(rows) > CANCEL_PAGE_SIZE
+    rows = rows[:CANCEL_PAGE_SIZE] if forward else rows[-CANCEL_PAGE_SIZE:]
+    if not rows:
+        return None
+    if not forward and not more:
+        page = 1  # Jobs ahead of this page finished meanwhile
+    has_prev = page > 1
+    has_next = more if forward else True
+
     keyboard = []
-    for job_id, post_text, start_time, duration in jobs:
+    for job_id, _, post_text, start_time, duration, _ in rows:
         # Calculate progress and time remaining
         elapsed = time.time() - start_time
         progress = min(int((elapsed / duration) * 100), 100)
         remaining = max(duration - elapsed, 0)
         time_left_str = T.format_time_left(remaining)
-        
+
         # Truncate post text for button display
         display_text = (post_text[:30] + '...') if len(post_text) > 30 else post_text
         if not display_text.strip():
             display_text = T.media_post_label
-        
+
         button_text = f"{display_text} ({progress}% - {time_left_str})"
         keyboard.append([InlineKeyboardButton(button_text, callback_data=f"cancel_job_{job_id}")])
-    
+
+    nav = []
+    if has_prev:
+        first = rows[0]
+        nav.append(InlineKeyboardButton(T.prev_page_label, callback_data=f"cancel_page_p_{page - 1}_{first[5]!r}_{first[0]}"))
+    if has_next:
+        last = rows[-1]
+        nav.append(InlineKeyboardButton(T.next_page_label, callback_data=f"cancel_page_n_{page + 1}_{last[5]!r}_{last[0]}"))
+    if nav:
+        keyboard.append(nav)
     keyboard.append([InlineKeyboardButton(T.cancel_selection_label, callback_data="cancel_selection")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return T.select_job_page_text(page), InlineKeyboardMarkup(keyboard)
+
 
-    await update.message.reply_text(T.select_job_to_cancel, reply_markup=reply_markup)
+async def cancel_job_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show active jobs, a page at a time, with an inline keyboard to select which one to cancel."""
+    context.user_data['cancel_filter'] = parse_cancel_filter(context.args)
+    picker = await build_cancel_page(context.user_data, 1, (-math.inf, 0))
+
+    if picker is None:
+        await update.message.reply_text(T.no_active_jobs)
+        return
+
+    text, reply_markup = picker
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+async def cancel_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Flip the /cancel picker to the previous or next page."""
+    query = update.callback_query
+    await query.answer()
+    _, _, direction, page, deadline, job_id = query.data.split('_')
+    picker = await build_cancel_page(context.user_data, int(page), (float(deadline), int(job_id)), direction == 'n')
+    if picker is None:
+        await query.edit_message_text(T.no_active_jobs)
+        return
+    text, reply_markup = picker
+    await query.edit_message_text(text, reply_markup=reply_markup)
+
+
+async def build_schedules_page(page: int, after: tuple):
+    """Text and keyboard of one page of /schedules (soonest countdown first), or None if there are none."""
+    rows = await STORE.page_schedules(after, CANCEL_PAGE_SIZE + 1)
+    more = len(rows) > CANCEL_PAGE_SIZE
+    rows = rows[:CANCEL_PAGE_SIZE]
+    if not rows:
+        return None
+    keyboard = []
+    for schedule_id, _, post_text, spec, next_run, _ in rows:
+        display_text = (post_text[:24] + '...') if len(post_text) > 24 else post_text
+        if not display_text.strip():
+            display_text = T.media_post_label
+        button_text = f"{display_text} ({spec} → {format_schedule_time(next_run)})"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"schedule_stop_{schedule_id}")])
+    if more:
+        last = rows[-1]
+        keyboard.append([InlineKeyboardButton(
+            T.next_page_label, callback_data=f"schedule_page_{page + 1}_{last[5]!r}_{last[0]}"
+        )])
+    return T.select_schedule_page_text(page), InlineKeyboardMarkup(keyboard)
+
+
+async def schedules_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """List recurring posts, a page at a time, with buttons to stop them."""
+    picker = await build_schedules_page(1, (-math.inf, 0))
+    if picker is None:
+        await update.message.reply_text(T.no_schedules)
+        return
+    text, reply_markup = picker
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+async def schedules_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop the selected recurring post, or flip /schedules to the next page."""
+    query = update.callback_query
+    await query.answer()
+    if query.data.startswith("schedule_page_"):
+        _, _, page, next_start, schedule_id = query.data.split('_')
+        picker = await build_schedules_page(int(page), (float(next_start), int(schedule_id)))
+        if picker is None:
+            await query.edit_message_text(T.no_schedules)
+            return
+        text, reply_markup = picker
+        await query.edit_message_text(text, reply_markup=reply_markup)
+        return
+
+    schedule_id = int(query.data.split("_")[2])
+    schedule = await STORE.get_schedule(schedule_id)
+    if schedule and await STORE.remove_schedule(schedule_id):
+        _, post_text, spec, _ = schedule
+        display_text = (post_text[:50] + '...') if len(post_text) > 50 else post_text
+        if not display_text.strip():
+            display_text = T.media_post_label
+        await query.edit_message_text(T.schedule_stopped_text(display_text, spec))
+    else:
+        await query.edit_message_text(T.schedule_not_found)
 
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Global error handler to log exceptions and avoid silent failures."""
+    metrics.HANDLER_ERRORS.inc()
     logging.exception("Unhandled exception while handling update", exc_info=context.error)
     # Best-effort notify the user in chats where it's safe to do so
     try:
@@ -226,26 +661,17 @@ async def handle_job_cancellation(update: Update, context: ContextTypes.DEFAULT_
     if query.data.startswith("cancel_job_"):
         job_id = int(query.data.split("_")[2])
         
-        # Get job details before marking as cancelled
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT chat_id, message_id, post_text FROM jobs WHERE id = ?", (job_id,))
-        job = cursor.fetchone()
+        # Stop the running job right away; the DB row is marked cancelled for the history
+        # (a worker process running it notices on its next heartbeat)
+        stop_job(job_id)
+        job = await STORE.get_job(job_id)
         
-        if job:
+        # A post already in the publish outbox can no longer be cancelled
+        if job and await STORE.cancel_job(job_id):
             chat_id, message_id, post_text = job
-            # Mark as cancelled; the running task will stop on next tick
-            cursor.execute("UPDATE jobs SET status = 'cancelled' WHERE id = ?", (job_id,))
-            conn.commit()
             
             # Try to delete the progress bar message
-            try:
-                await context.bot.delete_message(
-                    chat_id=chat_id,
-                    message_id=message_id
-                )
-            except Exception:
-                pass
+            await delete_progress_message(chat_id, message_id)
             
             display_text = (post_text[:50] + '...') if len(post_text) > 50 else post_text
             if not display_text.strip():
@@ -253,20 +679,38 @@ async def handle_job_cancellation(update: Update, context: ContextTypes.DEFAULT_
             await query.edit_message_text(T.job_cancelled_text(display_text))
         else:
             await query.edit_message_text(T.job_not_found)
-        
-        conn.close()
+
+
+def stop_job(job_id: int):
+    """
+    Stop a job running in this process without touching its messages.
+    :return: The stopped job, or None if it is not running here
+    """
+    job = REGISTRY.cancel(job_id)
+    if job is not None:
+        CADENCE.remove(job)
+        if DASHBOARDS is not None:
+            DASHBOARDS.remove(job)
+    return job
 
 
 async def check_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Check channel access with verified, non-contradictory results."""
-    if not CHANNEL_ID:
+    """Check access to one channel (/check_add <channel_id>) or to every configured channel."""
+    targets = [parse_chat_id(context.args[0])] if context.args else CHANNELS
+    if not targets:
         await update.message.reply_text(T.no_channel_configured)
         return
 
+    for channel_id in targets:
+        await check_channel_access(update, context, channel_id)
+
+
+async def check_channel_access(update: Update, context: ContextTypes.DEFAULT_TYPE, channel_id) -> None:
+    """Check channel access with verified, non-contradictory results."""
     try:
         # Get chat and membership
-        chat = await context.bot.get_chat(CHANNEL_ID)
-        member = await context.bot.get_chat_member(CHANNEL_ID, context.bot.id)
+        chat = await context.bot.get_chat(channel_id)
+        member = await context.bot.get_chat_member(channel_id, context.bot.id)
 
         role = member.status.title()
         is_admin = member.status == "administrator"
@@ -283,7 +727,7 @@ async def check_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         test_msg = None
         try:
             test_msg = await context.bot.send_message(
-                chat_id=CHANNEL_ID,
+                chat_id=channel_id,
                 text=T.test_message_text
             )
             send_ok = True
@@ -294,7 +738,7 @@ async def check_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             # Try edit
             try:
                 await context.bot.edit_message_text(
-                    chat_id=CHANNEL_ID,
+                    chat_id=channel_id,
                     message_id=test_msg.message_id,
                     text="✏️ Edit test — ok"
                 )
@@ -305,12 +749,14 @@ async def check_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
             # Try delete
             try:
-                await context.bot.delete_message(CHANNEL_ID, test_msg.message_id)
+                await context.bot.delete_message(channel_id, test_msg.message_id)
                 delete_ok = True
             except Exception as e:
                 delete_ok = False
                 delete_err = str(e)
 
+        CAPABILITIES.record_probe(channel_id, member, send_ok, bool(edit_ok), bool(delete_ok))
+
         # Compute readiness and next steps (use verified tests first)
         ready = bool(send_ok) and bool(edit_ok)
         steps = []
@@ -333,7 +779,7 @@ async def check_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         lines = []
         lines.append(T.access_check_title)
         lines.append("")
-        lines.append(f"🏢 {T.channel_label}: {chat.title} ({CHANNEL_ID})")
+        lines.append(f"🏢 {T.channel_label}: {chat.title} ({channel_id})")
         lines.append(f"🤖 {T.role_label}: {role}")
         lines.append("")
         lines.append(T.capabilities_verified_title)
@@ -361,70 +807,45 @@ async def check_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
 
     except Exception as e:
+        CAPABILITIES.invalidate(channel_id)
         error_msg = str(e)
         if "chat not found" in error_msg.lower():
             await update.message.reply_text(
-                T.channel_not_found_steps_template.format(channel_id=CHANNEL_ID)
+                T.channel_not_found_steps_template.format(channel_id=channel_id)
             )
         elif "not enough rights" in error_msg.lower():
             await update.message.reply_text(
-                T.insufficient_rights_template.format(channel_id=CHANNEL_ID)
+                T.insufficient_rights_template.format(channel_id=channel_id)
             )
         else:
             await update.message.reply_text(
-                T.generic_error_template.format(error=error_msg, channel_id=CHANNEL_ID)
+                T.generic_error_template.format(error=error_msg, channel_id=channel_id)
             )
 
 
-def add_job_to_db(chat_id, message_id, post_text, media, duration, start_time):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO jobs (chat_id, message_id, post_text, media, duration, start_time, status) VALUES (?, ?, ?, ?, ?, ?, 'active')",
-        (chat_id, message_id, post_text, json.dumps(media), duration, start_time)
-    )
-    conn.commit()
-    job_id = cursor.lastrowid
-    conn.close()
-    return job_id
-
-def remove_job_from_db(job_id):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
-    conn.commit()
-    conn.close()
-
-def get_job_status(job_id: int) -> str:
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT status FROM jobs WHERE id = ?", (job_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return row[0] if row else None
-
-
-async def run_progress(bot, post_text: str, media: dict, duration: float, job_id: int = None, message_id: int = None, start_time: int = None) -> None:
-    """
-    Run the progress bar in the target channel, then post the content.
-    :param bot: Telegram Bot instance
-    :param post_text: The content to post after the bar completes
-    :param media: Optional media dict ({'type','file_id'})
+async def run_progress(chat_id, post_text: str, media: dict, duration: float, job_id: int = None, message_id: int = None, start_time: int = None, stagger: bool = False, user_id: int = None) -> None:
+    """
+    Start (or resume) the progress bar in the target channel and hand it to the scheduler.
+    The running job keeps neither text nor media; finish_progress reads them back from the store.
+    :param chat_id: The channel the bar runs in and the post goes to
+    :param post_text: The content to post after the bar completes (for stored jobs its start is enough)
+    :param media: Optional media dict ({'type','file_id'}), only needed for new jobs
     :param duration: Total duration for the bar in seconds
     :param job_id: The job ID from the database
     :param message_id: The message ID of the progress bar message
     :param start_time: The start time of the progress bar
+    :param stagger: Delay the first edit by a random part of the step interval (used on resume)
+    :param user_id: The user who scheduled the post; its API calls are queued fairly per user
     """
     # If resuming, calculate elapsed time
     if start_time:
         elapsed = time.time() - start_time
-        if elapsed >= duration:
-            # Job should have already finished
-            remove_job_from_db(job_id)
-            return
     else:
         elapsed = 0
         start_time = time.time()
+    # Anchor the job to the monotonic clock before anything is sent, so neither a slow
+    # first bar nor slow edits delay the publish past the stored deadline
+    deadline = asyncio.get_running_loop().time() + (duration - elapsed)
 
     # Compute steps based on DESIRED_INTERVAL and enforce integer percent
     steps = max(int(duration / DESIRED_INTERVAL), 1)
@@ -439,124 +860,402 @@ async def run_progress(bot, post_text: str, media: dict, duration: float, job_id
         total_steps = math.ceil(100 / step_pct)
         interval = duration / total_steps
     
-    if not message_id:
-        # Send initial progress bar
-        message = await bot.send_message(
-            chat_id=CHANNEL_ID,
-            text=generate_progress_bar(0)
-        )
-        message_id = message.message_id
-        job_id = add_job_to_db(CHANNEL_ID, message_id, post_text, media, duration, start_time)
-    
-    progress = int((elapsed / duration) * 100)
-    seconds_left = max(duration - elapsed, 0)
-    time_left_str = T.format_time_left(seconds_left)
-
-    while elapsed < duration:
-        await asyncio.sleep(interval)
-
-        # Check for cancellation before attempting to edit
-        status = get_job_status(job_id)
-        if status is None or status == 'cancelled':
-            # Clean up and exit gracefully
-            try:
-                await bot.delete_message(chat_id=CHANNEL_ID, message_id=message_id)
-            except Exception:
-                pass
-            if status is not None:
-                remove_job_from_db(job_id)
-            return
-
-        elapsed += interval
-        progress = min(progress + step_pct, 100)
-        new_seconds_left = max(duration - elapsed, 0)
-
-        update_time = False
-        # Time is displayed in days and hours, update every hour
-        if seconds_left > 24 * 60 * 60:
-            if math.floor(seconds_left / 3600) != math.floor(new_seconds_left / 3600):
-                update_time = True
-        # Time is displayed in hours and minutes, or just minutes, update every minute
-        elif seconds_left > 60:
-            if math.floor(seconds_left / 60) != math.floor(new_seconds_left / 60):
-                update_time = True
-        # Less than a minute, update with the progress bar
-        else:
-            update_time = True
-
-        if update_time:
-            time_left_str = T.format_time_left(new_seconds_left)
-
-        seconds_left = new_seconds_left
-
-        bar_text = (
-            f"{generate_progress_bar(progress)}\n"
-            f"{time_left_str} {T.remaining_text}"
-        )
-
+    on_dashboard = DASHBOARDS is not None and not message_id
+    if on_dashboard:
+        message_id = 0  # Shown on the channel dashboard instead of a message of its own
+        if job_id is None:
+            job_id = await STORE.add_job(chat_id, message_id, post_text, media, duration, start_time,
+                                         WORKER_ID, lease_until(), user_id)
+    elif not message_id and elapsed < duration:
+        # Send initial progress bar (stored jobs may not have one yet, e.g. bulk imports)
         try:
-            await bot.edit_message_text(
-                chat_id=CHANNEL_ID,
-                message_id=message_id,
-                text=bar_text
+            message = await OUTBOUND.call(
+                PRIORITY_SEND, 'send_message', chat_id, user_id,
+                text=generate_progress_bar(0)
             )
         except Exception as e:
-            logging.warning(f"Edit failed: {e}")
+            if job_id is None:
+                raise  # Nothing is stored yet; the user sees the error
+            # A stored job still publishes on time, just without a bar
+            logging.warning(f"Job {job_id} runs without a progress bar: {e}")
+            message_id = 0
+        else:
+            message_id = message.message_id
+            if job_id is None:
+                job_id = await STORE.add_job(chat_id, message_id, post_text, media, duration, start_time,
+                                             WORKER_ID, lease_until(), user_id)
+            elif not await STORE.set_message_id(job_id, message_id):
+                # Cancelled while its bar was being sent; /cancel found no bar to delete then
+                await delete_progress_message(chat_id, message_id, user_id)
+                return
+
+    elapsed = duration - (deadline - asyncio.get_running_loop().time())
+    title = dashboard_title(post_text) if on_dashboard else None
+    job = ProgressJob(job_id, chat_id, message_id, duration, deadline, step_pct, interval, title, user_id)
+    job.elapsed = elapsed
+    REGISTRY.register(job)
+    if elapsed >= duration:
+        # Deadline passed while the bot was down: publish right away, from the scheduler,
+        # so resuming doesn't wait for overdue posts crawling out at the channel's rate
+        SCHEDULER.schedule_at(job, job.deadline)
+        return
+    if on_dashboard:
+        # The dashboard redraws the bar; the scheduler only has to publish it
+        SCHEDULER.schedule_at(job, job.deadline)
+        await DASHBOARDS.add(job)
+        return
+    if stagger:
+        # Spread resumed bars over their step so they don't all edit at once
+        first_tick = min(asyncio.get_running_loop().time() + random.uniform(0, interval), job.deadline)
+    else:
+        first_tick = job.deadline - duration + next_render_change(job)
+    SCHEDULER.schedule_at(job, first_tick)
+
 
-    # Remove the progress bar message
+async def progress_tick(job: ProgressJob):
+    """
+    Bring a job's bar up to date; called by the scheduler when the job is due.
+    :return: Loop time at which the bar text next changes, or None once the job is finished
+    """
+    now = asyncio.get_running_loop().time()
+    started = job.deadline - job.duration
+    update_progress(job, now)
+    if job.elapsed >= job.duration:
+        await finish_progress(job)
+        return None
+    if not job.message_id:
+        return job.deadline  # Drawn by its dashboard, or running without a bar
+    if not CAPABILITIES.allows(job.chat_id, 'can_edit'):
+        # Edits are refused in this channel; look again once the cached rights expire
+        return min(now + CAPABILITY_RETRY_TTL, job.deadline)
+
+    # Compare the parts, not the text: no rendered string is kept per job
+    left = T.format_time_left(max(job.duration - job.elapsed, 0))
+    if job.progress != job.last_progress or left != job.last_left:
+        # Queued, coalesced with any unsent edit of the same message
+        OUTBOUND.edit_text(job.chat_id, job.message_id, render_progress(job), job.user_id)
+        job.last_progress, job.last_left = job.progress, left
+
+    # Next text change, spaced out further when the channel's edit budget is stretched
+    return CADENCE.next_tick(job, now, started + next_render_change(job))
+
+
+async def delete_progress_message(chat_id, message_id: int, user_id: int = None) -> None:
+    """Best-effort removal of a progress bar message."""
+    if not message_id:
+        return  # The bar was never sent
+    OUTBOUND.discard_edits(chat_id, message_id)
+    if not CAPABILITIES.allows(chat_id, 'can_delete'):
+        return
     try:
-        await bot.delete_message(
-            chat_id=CHANNEL_ID,
-            message_id=message_id
-        )
+        await OUTBOUND.call(PRIORITY_DELETE, 'delete_message', chat_id, user_id, message_id=message_id)
     except Exception:
         pass
-    
-    remove_job_from_db(job_id)
 
-    # Send the final post (text or photo)
+
+async def finish_progress(job: ProgressJob) -> None:
+    """Publish the post at its deadline, remove the progress bar and record the skew."""
+    REGISTRY.unregister(job.job_id)
+    CADENCE.remove(job)
+    if DASHBOARDS is not None:
+        DASHBOARDS.remove(job)
+    # Only the lease holder publishes, and never a job cancelled meanwhile by another process.
+    # The same statement moves the job into the outbox and reads the post body back.
+    post = await STORE.claim_publish(job.job_id, WORKER_ID, lease_until(), lease_until())
+    if post is None:
+        logging.info(f"Job {job.job_id} not published here: cancelled or leased to another worker")
+        return
+
+    # Publish first (it outranks the delete in the queue); the bar goes away alongside
+    job.publish_skew, _ = await asyncio.gather(
+        record_publish(job.job_id, job.chat_id, *post, job.deadline, user_id=job.user_id),
+        delete_progress_message(job.chat_id, job.message_id, job.user_id),
+    )
+    if job.publish_skew is not None:
+        logging.info(f"Job {job.job_id} published with skew {job.publish_skew:+.3f}s")
+
+
+async def record_publish(job_id: int, chat_id, post_text: str, media: dict, due: float, attempt: int = 1,
+                         user_id: int = None):
+    """
+    Make one attempt at sending a post from the outbox. On success the job is marked
+    published with its skew; otherwise it stays in the outbox for a retry with
+    exponential backoff, or is marked failed once retrying is pointless.
+    :param due: Loop time the post was scheduled for
+    :return: Publish skew in seconds, or None if the attempt failed
+    """
+    PUBLISHING.add(job_id)
+    try:
+        await publish_post(chat_id, post_text, media, user_id)
+    except Exception as e:
+        # The channel rejecting the post won't change on retry (RetryAfter is retried by the queue)
+        if isinstance(e, (BadRequest, Forbidden)) or attempt >= MAX_PUBLISH_ATTEMPTS:
+            logging.error(f"Job {job_id} failed after {attempt} publish attempts: {e}")
+            await STORE.finish_job(job_id, 'failed')
+        else:
+            delay = min(PUBLISH_RETRY_BASE * 2 ** (attempt - 1), PUBLISH_RETRY_MAX)
+            logging.warning(f"Publishing job {job_id} failed ({e}); attempt {attempt + 1} in {delay:.0f}s")
+            metrics.PUBLISH_RETRIES.inc()
+            await STORE.retry_publish(job_id, time.time() + delay)
+        return None
+    finally:
+        PUBLISHING.discard(job_id)
+    skew = asyncio.get_running_loop().time() - due
+    metrics.PUBLISH_SKEW.observe(skew)
+    await STORE.finish_job(job_id, 'published', skew)
+    return skew
+
+
+async def publish_post(chat_id, post_text: str, media: dict, user_id: int = None) -> None:
+    """Send the final post (text or photo) to the channel, queued fairly for the user who scheduled it."""
     if media and media.get('type') == 'photo':
-        await bot.send_photo(
-            chat_id=CHANNEL_ID,
+        await OUTBOUND.call(
+            PRIORITY_PUBLISH, 'send_photo', chat_id, user_id,
             photo=media['file_id'],
             caption=post_text or None
         )
     else:
-        await bot.send_message(
-            chat_id=CHANNEL_ID,
+        await OUTBOUND.call(
+            PRIORITY_PUBLISH, 'send_message', chat_id, user_id,
             text=post_text
         )
 
 
-async def resume_jobs(app):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, chat_id, message_id, post_text, media, duration, start_time FROM jobs WHERE status = 'active'")
-    jobs = cursor.fetchall()
-    conn.close()
+def start_claimed_jobs(jobs: list) -> None:
+    """
+    Run jobs just leased from the store, with staggered first edits. Their bars are
+    sent in the background, so the caller can claim more without waiting for them.
+    """
+    for job_id, chat_id, message_id, preview, duration, start_time, _, user_id in jobs:
+        start_job(job_id, run_progress(
+            chat_id, preview, None, duration, job_id, message_id, start_time, stagger=True, user_id=user_id
+        ))
+
+
+def start_job(job_id: int, starting) -> None:
+    """
+    Run the coroutine ``starting`` that starts a stored job in the background. Until it
+    is done the job counts as running here, so its lease is renewed and it isn't claimed again.
+    """
+    task = asyncio.create_task(starting)
+    STARTING[job_id] = task
+    task.add_done_callback(functools.partial(job_started, job_id))
+
+
+def job_started(job_id: int, task: asyncio.Task) -> None:
+    """Done callback of start_job; a job that failed to start is left for its lease to lapse and be claimed again."""
+    STARTING.pop(job_id, None)
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Failed to start job {job_id}", exc_info=task.exception())
 
-    for job in jobs:
-        job_id, chat_id, message_id, post_text, media, duration, start_time = job
-        media_dict = json.loads(media)
-        asyncio.create_task(
-            run_progress(app.bot, post_text, media_dict, duration, job_id, message_id, start_time)
-        )
 
-async def main() -> None:
+async def resume_jobs() -> None:
+    """
+    Resume active jobs page by page after a restart: those this worker held
+    before plus any nobody holds. Pages follow the (status, deadline) index,
+    so overdue posts are published first; the rest get staggered first edits.
+    Jobs started by /run or /import since this process came up are left alone,
+    they are already running (or about to be).
+    """
+    started = time.monotonic()
+    resumed = 0
+    after = (-math.inf, 0)
+    while True:
+        jobs = await STORE.claim_jobs(WORKER_ID, time.time(), lease_until(), RESUME_PAGE_SIZE, after, STARTED_AT)
+        if not jobs:
+            break
+        start_claimed_jobs([job for job in jobs if job[0] not in REGISTRY and job[0] not in STARTING])
+        resumed += len(jobs)
+        after = (jobs[-1][6], jobs[-1][0])
+    if DASHBOARDS is not None:
+        # Dashboards of channels whose posts all went out while the bot was down
+        await DASHBOARDS.drop_adopted()
+    logging.info(f"Resumed {resumed} jobs in {time.monotonic() - started:.2f}s")
+
+
+async def take_over_jobs() -> None:
+    """
+    Resume this worker's jobs, then periodically claim jobs no worker holds (new
+    ones stored by an updates process, or those of a worker that died) and start
+    recurring posts as their countdowns begin. Expansion waits for the resume,
+    which would otherwise reclaim the freshly expanded jobs a second time.
+    """
+    await resume_jobs()
+    while True:
+        try:
+            await start_due_schedules()
+        except Exception:
+            logging.exception("Expanding recurring schedules failed")
+        await asyncio.sleep(CLAIM_INTERVAL)
+        try:
+            while True:
+                jobs = await STORE.claim_jobs(WORKER_ID, time.time(), lease_until(), RESUME_PAGE_SIZE)
+                # Our own jobs come back only if a stall let their leases lapse; they are still running
+                fresh = [job for job in jobs if job[0] not in REGISTRY and job[0] not in STARTING]
+                if fresh:
+                    logging.info(f"Claimed {len(fresh)} jobs")
+                    start_claimed_jobs(fresh)
+                if len(jobs) < RESUME_PAGE_SIZE:
+                    break
+        except Exception:
+            logging.exception("Claiming jobs failed")
+
+
+async def keep_leases() -> None:
+    """
+    Heartbeat: renew the leases on this worker's jobs, and stop running jobs whose
+    lease is gone (cancelled by another process, or taken over after a stall).
+    Posts still waiting in the outbound queue have their retry time pushed back too.
+    """
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            running = [job.job_id for job in REGISTRY]  # Before renewing, so new jobs aren't mistaken for lost
+            # Only jobs actually running, starting or publishing here: a job that failed to start
+            # loses its lease and is claimed again instead of being held forever
+            held = await STORE.renew_leases(WORKER_ID, lease_until(), {*running, *STARTING, *PUBLISHING})
+            await asyncio.gather(*(STORE.retry_publish(job_id, lease_until()) for job_id in list(PUBLISHING)))
+            for job_id in running:
+                if job_id not in held and stop_job(job_id) is not None:
+                    logging.info(f"Job {job_id} stopped: its lease is gone")
+        except Exception:
+            logging.exception("Renewing leases failed")
+
+
+async def drain_outbox() -> None:
+    """
+    Retry outbox posts whose last attempt failed or never reported back (a crashed
+    worker); each claim defers the next attempt, so a post is retried by one worker at a time.
+    Posts this process is still sending (e.g. held back by the channel's rate limit) are skipped.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(OUTBOX_INTERVAL)
+        try:
+            while True:
+                now = time.time()
+                posts = await STORE.claim_outbox(WORKER_ID, now, lease_until(), lease_until(), RESUME_PAGE_SIZE)
+                # Sent through the publish pool, which bounds concurrency and rate
+                await asyncio.gather(*(
+                    record_publish(job_id, chat_id, post_text, media, loop.time() - (now - deadline), attempts, user_id)
+                    for job_id, chat_id, post_text, media, attempts, deadline, user_id in posts
+                    if job_id not in PUBLISHING
+                ))
+                if len(posts) < RESUME_PAGE_SIZE:
+                    break
+        except Exception:
+            logging.exception("Draining the publish outbox failed")
+
+
+async def start_due_schedules() -> None:
+    """
+    Start the jobs of recurring posts whose countdown has begun. Only the due end of
+    the schedules' next-start index is read, so waiting schedules cost nothing.
+    """
+    while True:
+        jobs = await STORE.expand_schedules(time.time(), next_occurrence, WORKER_ID, lease_until(), RESUME_PAGE_SIZE)
+        if jobs:
+            logging.info(f"Started {len(jobs)} recurring jobs")
+            start_claimed_jobs(jobs)
+        if len(jobs) < RESUME_PAGE_SIZE:
+            break
+
+
+async def archive_jobs() -> None:
+    """Periodically move finished jobs into jobs_history and drop history past retention."""
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+        purge_before = time.time() - HISTORY_RETENTION_DAYS * 86400 if HISTORY_RETENTION_DAYS else None
+        try:
+            while True:
+                moved, purged = await STORE.archive_finished(ARCHIVE_BATCH_SIZE, purge_before)
+                # A full batch means a backlog is left: keep going, one transaction per batch
+                if moved < ARCHIVE_BATCH_SIZE and purged < ARCHIVE_BATCH_SIZE:
+                    break
+        except Exception:
+            logging.exception("Archiving finished jobs failed")
+
+
+def make_request(size: int, timeout: float) -> HTTPXRequest:
+    """An HTTPX connection pool for Bot API calls."""
+    return HTTPXRequest(
+        connection_pool_size=size,
+        read_timeout=timeout,
+        write_timeout=timeout,
+        connect_timeout=timeout,
+        pool_timeout=timeout,
+        media_write_timeout=max(timeout, 20.0),
+        http_version=HTTP_VERSION,
+        httpx_kwargs={'limits': httpx.Limits(
+            max_connections=size, max_keepalive_connections=size, keepalive_expiry=KEEPALIVE_EXPIRY,
+        )},
+    )
+
+
+def health_problems() -> list:
+    """Reasons the bot should be reported unhealthy; empty when all is well."""
+    problems = []
+    overdue = SCHEDULER.overdue(asyncio.get_running_loop().time())
+    if overdue > HEALTH_MAX_OVERDUE:
+        problems.append(f"scheduler is {overdue:.1f}s behind")
+    if LAG_MONITOR.last_lag > HEALTH_MAX_LOOP_LAG:
+        problems.append(f"event loop lag is {LAG_MONITOR.last_lag:.1f}s")
+    return problems
+
+
+def register_gauges() -> None:
+    """Point the scrape-time gauges at the live scheduler, queue and registry."""
+    loop = asyncio.get_running_loop()
+    metrics.ACTIVE_JOBS.set_function(lambda: len(REGISTRY))
+    metrics.SCHEDULER_JOBS.set_function(lambda: len(SCHEDULER))
+    metrics.SCHEDULER_DUE_JOBS.set_function(lambda: SCHEDULER.due_count(loop.time()))
+    metrics.SCHEDULER_OVERDUE.set_function(lambda: SCHEDULER.overdue(loop.time()))
+    metrics.OUTBOUND_QUEUED.set_function(lambda: len(OUTBOUND))
+    metrics.CADENCE_BACKOFF.set_function(CADENCE.peak_backoff)
+
+
+async def main(mode: str = 'polling', role: str = 'all') -> None:
+    global SCHEDULER, STORE, OUTBOUND, LAG_MONITOR, DASHBOARDS, CAPABILITIES, ROLE
+    ROLE = role
+    runs_jobs = role != 'updates'
+    started = time.monotonic()
     logging.basicConfig(level=logging.INFO)
     
-    init_db()
-
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    STORE = JobStore(DB_FILE)
+    await STORE.open()
+
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(make_request(**EDIT_POOL))
+        .get_updates_request(make_request(**UPDATES_POOL))
+        .build()
+    )
+    # Final posts get their own bot and connections, so they never queue behind bar edits
+    publish_bot = Bot(BOT_TOKEN, request=make_request(**PUBLISH_POOL))
+    SCHEDULER = ShardedScheduler(progress_tick)
+    CAPABILITIES = CapabilityCache(app.bot, CAPABILITY_TTL, CAPABILITY_RETRY_TTL)
+    OUTBOUND = OutboundQueue(app.bot, GLOBAL_RATE, CHAT_RATE, CHAT_BURST, OUTBOUND_IN_FLIGHT,
+                             feedback=CADENCE.record, on_error=CAPABILITIES.on_error, tenant_weights=USER_WEIGHTS)
+    OUTBOUND.add_pool(PRIORITY_PUBLISH, publish_bot, PUBLISH_IN_FLIGHT)
+    LAG_MONITOR = metrics.LoopLagMonitor()
+    if DASHBOARD_MODE and runs_jobs:
+        DASHBOARDS = DashboardManager(OUTBOUND, STORE, render_dashboard_line, T.dashboard_header,
+                                      DASHBOARD_INTERVAL, DASHBOARD_MAX_JOBS)
+        await DASHBOARDS.load()
     app.add_error_handler(error_handler)
 
     # Allow re-entering /run even if a previous conversation is still active.
     # This fixes the case where sending /run again appears to do nothing
     # because the conversation was waiting for non-command input.
     conv = ConversationHandler(
-        entry_points=[CommandHandler('run', run_command)],
+        entry_points=[CommandHandler('run', run_command), CommandHandler('repeat', repeat_command),
+                      CommandHandler('import', import_command)],
         states={
             POST: [MessageHandler(filters.ALL & ~filters.COMMAND, receive_post)],
+            CHANNEL: [CallbackQueryHandler(channel_selection, pattern=r"^channel_\d+$")],
+            IMPORT: [MessageHandler(filters.ALL & ~filters.COMMAND, receive_import)],
+            REPEAT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_recurrence)],
             TIME: [
                 CallbackQueryHandler(time_selection),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, custom_time_input),
@@ -572,24 +1271,83 @@ async def main() -> None:
     app.add_handler(conv)
     app.add_handler(CommandHandler('cancel', cancel_job_command))
     app.add_handler(CommandHandler('check_add', check_add_command))
+    app.add_handler(CommandHandler('schedules', schedules_command))
     app.add_handler(CallbackQueryHandler(handle_job_cancellation, pattern=r"^(cancel_job_\d+|cancel_selection)$"))
+    app.add_handler(CallbackQueryHandler(cancel_page_callback, pattern=r"^cancel_page_[np]_\d+_"))
+    app.add_handler(CallbackQueryHandler(schedules_callback, pattern=r"^schedule_(stop|page)_\d+"))
     
     await app.initialize()
-    await resume_jobs(app)
-    await app.start()
-    await app.updater.start_polling()
+    await publish_bot.initialize()
+    OUTBOUND.start()
+    SCHEDULER.start()
+    LAG_MONITOR.start()
+    if DASHBOARDS is not None:
+        DASHBOARDS.start()
+    register_gauges()
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = HTTPServer(metrics.make_metrics_handler(health_problems), METRICS_LISTEN, METRICS_PORT)
+        await metrics_server.start()
+        logging.info(f"Metrics on http://{METRICS_LISTEN}:{metrics_server.port}/metrics")
+    webhook_server = None
+    if role == 'worker':
+        logging.info(f"Worker {WORKER_ID} started in {time.monotonic() - started:.2f}s, not receiving updates")
+    elif mode == 'webhook':
+        await app.start()
+        # Updates arrive over HTTP on this loop, next to the job scheduler
+        webhook_server = HTTPServer(make_webhook_handler(app, WEBHOOK_PATH, WEBHOOK_SECRET), WEBHOOK_LISTEN, WEBHOOK_PORT)
+        await webhook_server.start()
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(WEBHOOK_URL, secret_token=WEBHOOK_SECRET, allowed_updates=Update.ALL_TYPES)
+        logging.info(f"Webhook listening on {WEBHOOK_LISTEN}:{webhook_server.port}{WEBHOOK_PATH}")
+        logging.info(f"Startup took {time.monotonic() - started:.2f}s until webhook ready")
+    else:
+        await app.start()
+        await app.updater.start_polling()
+        logging.info(f"Startup took {time.monotonic() - started:.2f}s until first poll")
+
+    tasks = []
+    if runs_jobs:
+        # Resume in the background so commands are served while the backlog loads
+        tasks += [asyncio.create_task(take_over_jobs()), asyncio.create_task(keep_leases()),
+                  asyncio.create_task(drain_outbox())]
+    if role != 'worker':
+        tasks.append(asyncio.create_task(archive_jobs()))
     
     # Keep the bot running
-    while True:
-        await asyncio.sleep(3600) # Keep alive
+    try:
+        while True:
+            await asyncio.sleep(3600) # Keep alive
+    finally:
+        for task in tasks:
+            task.cancel()
+        if webhook_server is not None:
+            await webhook_server.stop()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        await LAG_MONITOR.stop()
+        if DASHBOARDS is not None:
+            await DASHBOARDS.stop()
+        await SCHEDULER.stop()
+        await OUTBOUND.stop()
+        await publish_bot.shutdown()
+        if runs_jobs:
+            # Let other workers pick our jobs up now instead of after LEASE_TTL
+            await STORE.release_leases(WORKER_ID)
+        await STORE.close()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Progresser Bot')
     parser.add_argument('--language', '-l', default='ru', choices=['ru', 'en'], help='Interface language (default: ru)')
+    parser.add_argument('--mode', '-m', default='polling', choices=['polling', 'webhook'], help='How to receive updates (default: polling)')
+    parser.add_argument('--role', '-r', default='all', choices=['all', 'updates', 'worker'],
+                        help='Handle Telegram updates, run jobs, or both (default: all)')
     args = parser.parse_args()
+    if args.mode == 'webhook' and args.role != 'worker' and not WEBHOOK_SECRET:
+        parser.error("--mode webhook requires WEBHOOK_SECRET, otherwise anyone can post updates to the endpoint")
 
     # Initialize translator before starting the bot
     T = get_translator(args.language)
 
-    asyncio.run(main())
+    asyncio.run(main(args.mode, args.role))
@@ -0,0 +1,79 @@
+import math
+
+
+class _ChatCadence:
+    __slots__ = ('weight', 'backoff')
+
+    def __init__(self):
+        self.weight = 0.0   # Sum of the current weights of the chat's running jobs
+        self.backoff = 1.0  # Multiplier on every gap in the chat, grows with rejections
+
+
+class CadenceController:
+    """
+    Share a per-chat edit budget between the progress bars running in it.
+
+    Each job gets a weight of ``1 / sqrt(seconds left + 1)``, so bars close
+    to their deadline edit more often than ones with hours to go, and the
+    minimum gap between a job's edits is chosen so the chat as a whole stays
+    within ``edit_budget`` edits per second. Weights are refreshed on each
+    job's own tick, so the per-chat sum is kept up to date in O(1).
+
+    Rejections (RetryAfter, failed calls) multiply the chat's gaps by
+    ``backoff_step`` up to ``max_backoff``; every accepted call shrinks the
+    multiplier by ``recovery`` back towards 1.
+    """
+
+    def __init__(self, edit_budget: float, max_backoff: float = 16.0,
+                 backoff_step: float = 2.0, recovery: float = 0.95):
+        """
+        :param edit_budget: Progress bar edits per second allowed in one chat
+        """
+        self.edit_budget = edit_budget
+        self.max_backoff = max_backoff
+        self.backoff_step = backoff_step
+        self.recovery = recovery
+        self._chats = {}
+
+    def _chat(self, chat_id) -> _ChatCadence:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatCadence()
+        return chat
+
+    def next_tick(self, job, now: float, change_at: float) -> float:
+        """
+        Loop time of the job's next tick: when its text next changes, but no
+        sooner than its share of the chat's edit budget allows.
+        """
+        chat = self._chat(job.chat_id)
+        weight = 1 / math.sqrt(max(job.deadline - now, 0.0) + 1)
+        chat.weight += weight - job.weight
+        job.weight = weight
+        gap = chat.weight / (self.edit_budget * weight) * chat.backoff
+        return min(max(change_at, now + gap), job.deadline)
+
+    def remove(self, job) -> None:
+        """Drop a finished or cancelled job's share of its chat's budget."""
+        chat = self._chats.get(job.chat_id)
+        if chat is not None:
+            chat.weight = max(chat.weight - job.weight, 0.0)
+            if chat.weight < 1e-12 and chat.backoff == 1.0:
+                del self._chats[job.chat_id]
+        job.weight = 0.0
+
+    def record(self, chat_id, ok: bool) -> None:
+        """Feed back the outcome of an API call into the chat's backoff."""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if ok:
+                return
+            chat = self._chat(chat_id)
+        if ok:
+            chat.backoff = max(chat.backoff * self.recovery, 1.0)
+        else:
+            chat.backoff = min(chat.backoff * self.backoff_step, self.max_backoff)
+
+    def peak_backoff(self) -> float:
+        """Largest backoff multiplier across chats (1.0 when nothing is throttled)."""
+        return max((chat.backoff for chat in self._chats.values()), default=1.0)
@@ -0,0 +1,139 @@
+import logging
+import time
+
+from telegram.error import BadRequest, Forbidden
+
+# Error texts meaning the bot lacks a right in the chat (as opposed to a problem with one message)
+RIGHTS_ERRORS = ('not enough rights', 'administrator rights', 'chat_admin_required',
+                 'chat_write_forbidden', 'chat not found')
+
+# Which capability a failed call tells us about
+_METHOD_CAPABILITY = {
+    'send_message': 'can_post',
+    'send_photo': 'can_post',
+    'edit_message_text': 'can_edit',
+    'delete_message': 'can_delete',
+}
+
+
+class ChannelCapabilities:
+    """What the bot may do in one chat, and how sure we are about it."""
+
+    __slots__ = ('can_post', 'can_edit', 'can_delete', 'verified', 'error', 'checked_at')
+
+    def __init__(self, can_post: bool, can_edit: bool, can_delete: bool, checked_at: float,
+                 verified: bool = False, error: str = None):
+        self.can_post = can_post
+        self.can_edit = can_edit
+        self.can_delete = can_delete
+        self.verified = verified  # True once a live probe (/check_add) confirmed the rights
+        self.error = error  # Why the chat is unusable, if it is
+        self.checked_at = checked_at
+
+    @property
+    def ready(self) -> bool:
+        """A progress bar can run here: the bot can post and edit its own messages."""
+        return self.can_post and self.can_edit
+
+    @classmethod
+    def from_member(cls, member, now: float) -> 'ChannelCapabilities':
+        """Rights of the bot from its ChatMember (channels report explicit admin flags, groups mostly don't)."""
+        status = member.status
+        if status == 'creator':
+            return cls(True, True, True, now)
+        if status == 'administrator':
+            can_post = getattr(member, 'can_post_messages', None) is not False
+            can_edit = getattr(member, 'can_edit_messages', None) is not False
+            # With the post right a bot may delete its own messages in a channel
+            can_delete = bool(getattr(member, 'can_delete_messages', False)) or can_post
+            return cls(can_post, can_edit, can_delete, now)
+        if status == 'member':
+            return cls(True, True, True, now)
+        if status == 'restricted':
+            can_post = bool(getattr(member, 'can_send_messages', False))
+            return cls(can_post, can_post, can_post, now)
+        return cls(False, False, False, now, error=f"bot is {status}")
+
+
+class CapabilityCache:
+    """
+    Per-chat cache of the bot's rights, so jobs are checked before a countdown
+    starts instead of failing edit after edit.
+
+    Entries come from ``get_chat_member`` (one call, no message sent) or from the
+    live send/edit/delete probe of /check_add, and expire after ``ttl`` seconds
+    (``retry_ttl`` for chats that turned out unusable, so fixed rights are noticed
+    soon). Permission errors reported by the outbound queue overwrite the failed
+    capability until the entry expires.
+    """
+
+    def __init__(self, bot, ttl: float = 600.0, retry_ttl: float = 60.0):
+        self.bot = bot
+        self.ttl = ttl
+        self.retry_ttl = retry_ttl
+        self._entries = {}
+
+    def _fresh(self, chat_id, now: float):
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return None
+        ttl = self.ttl if entry.ready else self.retry_ttl
+        return entry if now - entry.checked_at < ttl else None
+
+    async def get(self, chat_id):
+        """
+        Cached capabilities of a chat, looked up with get_chat_member when missing or stale.
+        :return: ChannelCapabilities, or None if they could not be determined (e.g. network error)
+        """
+        now = time.monotonic()
+        entry = self._fresh(chat_id, now)
+        if entry is not None:
+            return entry
+        try:
+            member = await self.bot.get_chat_member(chat_id, self.bot.id)
+        except (BadRequest, Forbidden) as e:
+            entry = ChannelCapabilities(False, False, False, now, error=str(e))
+        except Exception as e:
+            logging.warning(f"Could not check rights in chat {chat_id}: {e}")
+            return None
+        else:
+            entry = ChannelCapabilities.from_member(member, now)
+        self._entries[chat_id] = entry
+        return entry
+
+    def allows(self, chat_id, capability: str) -> bool:
+        """False only if a fresh entry says the bot lacks ``capability`` (e.g. 'can_edit'); no API call."""
+        entry = self._fresh(chat_id, time.monotonic())
+        return entry is None or getattr(entry, capability)
+
+    def record_probe(self, chat_id, member, can_post: bool, can_edit: bool, can_delete: bool) -> None:
+        """Store the verified outcome of a live probe, taking precedence over the member flags."""
+        entry = ChannelCapabilities.from_member(member, time.monotonic())
+        entry.can_post, entry.can_edit, entry.can_delete = can_post, can_edit, can_delete
+        entry.verified = True
+        self._entries[chat_id] = entry
+
+    def invalidate(self, chat_id) -> None:
+        self._entries.pop(chat_id, None)
+
+    def on_error(self, chat_id, method: str, error: Exception) -> None:
+        """OutboundQueue error hook: remember rights the chat turned out to lack."""
+        if not isinstance(error, (BadRequest, Forbidden)):
+            return
+        if not isinstance(error, Forbidden) and not any(text in str(error).lower() for text in RIGHTS_ERRORS):
+            return  # About one message (e.g. too old to edit), not the chat
+        now = time.monotonic()
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            entry = self._entries[chat_id] = ChannelCapabilities(True, True, True, now)
+        if isinstance(error, Forbidden):
+            entry.can_post = entry.can_edit = entry.can_delete = False
+        else:
+            capability = _METHOD_CAPABILITY.get(method)
+            if capability is None:
+                return
+            setattr(entry, capability, False)
+        entry.verified = False
+        entry.error = str(error)
+        entry.checked_at = now
+        logging.warning(f"Bot lacks rights in chat {chat_id} ({method}): {error}")
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+
+from outbound import PRIORITY_DELETE, PRIORITY_SEND
+
+
+class _Board:
+    """The dashboard message of one channel and the jobs shown on it."""
+
+    def __init__(self, chat_id, message_id: int = None):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.jobs = {}
+        self.last_text = None
+        self.lock = asyncio.Lock()  # Serializes creating/deleting the message
+
+
+class DashboardManager:
+    """
+    Show every running bar of a channel as lines of one pinned message.
+
+    Jobs on a board have no message of their own. A single task refreshes
+    all boards every ``interval`` seconds, rendering each one once and
+    queueing at most one edit per board, so the API cost per refresh is
+    constant no matter how many jobs a channel has. Board message ids are
+    kept in the job store, so boards survive restarts.
+    """
+
+    def __init__(self, outbound, store, render_line, header: str, interval: float = 6.0, max_jobs: int = 20):
+        """
+        :param render_line: ``render_line(job)`` returning the job's lines of the board
+        :param header: First line of every board
+        :param max_jobs: Jobs listed per board (soonest first); the rest are counted
+        """
+        self._outbound = outbound
+        self._store = store
+        self._render_line = render_line
+        self.header = header
+        self.interval = interval
+        self.max_jobs = max_jobs
+        self._boards = {}
+        self._adopted = {}  # chat_id -> board message id left by the previous run
+        self._task = None
+        self._creating = set()  # Retries of board messages whose creation failed
+
+    def __contains__(self, job) -> bool:
+        board = self._boards.get(job.chat_id)
+        return board is not None and job.job_id in board.jobs
+
+    # ---------- Lifecycle ----------
+    async def load(self) -> None:
+        """Remember the board messages left by the previous run, for resumed jobs to reuse."""
+        self._adopted = dict(await self._store.list_dashboards())
+
+    async def drop_adopted(self) -> None:
+        """Delete old board messages no resumed job has claimed (call once resuming is done)."""
+        adopted, self._adopted = self._adopted, {}
+        for chat_id, message_id in adopted.items():
+            await self._store.remove_dashboard(chat_id)
+            try:
+                await self._outbound.call(PRIORITY_DELETE, 'delete_message', chat_id, message_id=message_id)
+            except Exception:
+                pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- Jobs ----------
+    async def add(self, job) -> None:
+        """
+        Put a job on its channel's board, creating (and pinning) the board message if needed.
+        If the message can't be created the job stays on the board and the next refresh retries.
+        """
+        board = self._boards.get(job.chat_id)
+        if board is None:
+            board = self._boards[job.chat_id] = _Board(job.chat_id, self._adopted.pop(job.chat_id, None))
+        board.jobs[job.job_id] = job
+        await self._ensure_message(board)
+
+    def remove(self, job) -> None:
+        """Take a finished or cancelled job off its board; empty boards go on the next refresh."""
+        board = self._boards.get(job.chat_id)
+        if board is not None:
+            board.jobs.pop(job.job_id, None)
+
+    # ---------- Board messages ----------
+    async def _ensure_message(self, board: _Board) -> None:
+        async with board.lock:
+            if board.message_id is None:
+                try:
+                    await self._create(board)
+                except Exception as e:
+                    logging.warning(f"Could not create dashboard in chat {board.chat_id}: {e}")
+
+    async def _create(self, board: _Board) -> None:
+        message = await self._outbound.call(PRIORITY_SEND, 'send_message', board.chat_id, text=self.header)
+        board.message_id = message.message_id
+        board.last_text = self.header
+        await self._store.set_dashboard(board.chat_id, board.message_id)
+        try:
+            await self._outbound.call(PRIORITY_SEND, 'pin_chat_message', board.chat_id,
+                                      message_id=board.message_id, disable_notification=True)
+        except Exception as e:
+            logging.warning(f"Could not pin dashboard in chat {board.chat_id}: {e}")
+
+    async def _delete(self, board: _Board) -> None:
+        async with board.lock:
+            if board.jobs or board.message_id is None:
+                return  # A job arrived meanwhile
+            message_id, board.message_id = board.message_id, None
+            if self._boards.get(board.chat_id) is board:
+                del self._boards[board.chat_id]
+            self._outbound.discard_edits(board.chat_id, message_id)
+            await self._store.remove_dashboard(board.chat_id)
+            try:
+                await self._outbound.call(PRIORITY_DELETE, 'delete_message', board.chat_id, message_id=message_id)
+            except Exception:
+                pass
+
+    def render(self, board: _Board) -> str:
+        jobs = sorted(board.jobs.values(), key=lambda job: job.deadline)
+        lines = [self.header]
+        for job in jobs[:self.max_jobs]:
+            lines.append("")
+            lines.append(self._render_line(job))
+        if len(jobs) > self.max_jobs:
+            lines.append("")
+            lines.append(f"… +{len(jobs) - self.max_jobs}")
+        return "\n".join(lines)
+
+    async def refresh(self) -> None:
+        """Queue one edit per changed board and delete boards that have no jobs left."""
+        for board in list(self._boards.values()):
+            if not board.jobs:
+                await self._delete(board)
+                continue
+            if board.message_id is None:
+                if not board.lock.locked():
+                    # Creating it failed before; retry off the refresh so other boards aren't held up
+                    task = asyncio.create_task(self._ensure_message(board))
+                    self._creating.add(task)
+                    task.add_done_callback(self._creating.discard)
+                continue
+            text = self.render(board)
+            if text != board.last_text:
+                self._outbound.edit_text(board.chat_id, board.message_id, text)
+                board.last_text = text
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logging.exception("Dashboard refresh failed")
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+
+MAX_BODY_SIZE = 1 << 20      # Largest request body accepted, bytes
+IDLE_TIMEOUT = 60.0          # Seconds a keep-alive connection may sit idle
+REQUEST_TIMEOUT = 10.0       # Seconds allowed for the headers, and again for the body, once a request has started
+
+_REASONS = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 408: 'Request Timeout', 413: 'Payload Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class HTTPServer:
+    """
+    Minimal HTTP/1.1 server running on the bot's own event loop.
+
+    It understands just enough of the protocol for Telegram webhooks and
+    local scrape endpoints: one request at a time per connection, bodies
+    sized by Content-Length, and keep-alive. Requests are passed to
+    ``handler(method, path, headers, body)``, which returns a
+    ``(status, content_type, body)`` tuple.
+    """
+
+    def __init__(self, handler, host: str, port: int):
+        self._handler = handler
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        # Report the bound port (useful when started with port 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, 'text/plain', b'bad request', close=True)
+                    break
+
+                try:
+                    headers = await asyncio.wait_for(self._read_headers(reader), REQUEST_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await self._respond(writer, 408, 'text/plain', b'timeout', close=True)
+                    break
+
+                length = headers.get('content-length') or '0'
+                if not length.isdigit():
+                    await self._respond(writer, 400, 'text/plain', b'bad content-length', close=True)
+                    break
+                length = int(length)
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, 'text/plain', b'too large', close=True)
+                    break
+                try:
+                    body = await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT) if length else b''
+                except asyncio.TimeoutError:
+                    await self._respond(writer, 408, 'text/plain', b'timeout', close=True)
+                    break
+
+                try:
+                    status, content_type, payload = await self._handler(method, target.split('?', 1)[0], headers, body)
+                except Exception:
+                    logging.exception("HTTP handler failed")
+                    status, content_type, payload = 500, 'text/plain', b'error'
+
+                close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+                await self._respond(writer, status, content_type, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # ValueError: a header line longer than the stream limit
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> dict:
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _respond(writer, status: int, content_type: str, payload: bytes, close: bool) -> None:
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
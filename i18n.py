@@ -1,9 +1,15 @@
+import functools
 import math
 
+# Max distinct time-left strings memoized per translator
+TIME_LEFT_CACHE_SIZE = 4096
+
 
 class Translator:
-    def __init__(self, lang: str):
+    def __init__(self, lang: str, time_left_cache_size: int = TIME_LEFT_CACHE_SIZE):
         self.lang = lang if lang in ("en", "ru") else "ru"
+        # Time-left strings repeat across jobs and ticks; format each one once
+        self._format_minutes = functools.lru_cache(maxsize=time_left_cache_size)(self._format_minutes_uncached)
 
         if self.lang == "en":
             # English messages
@@ -12,7 +18,10 @@ class Translator:
                 "Schedule posts to your channel with a live progress bar that counts down until publish.\n\n"
                 "📋 Available commands:\n"
                 "• `/run` — schedule a new post\n"
-                "• `/cancel` — view/cancel active schedules\n"
+                "• `/repeat` — schedule a recurring post\n"
+                "• `/schedules` — view/stop recurring posts\n"
+                "• `/import` — schedule many posts from a JSON/CSV file\n"
+                "• `/cancel [channel_id | text]` — view/cancel active schedules\n"
                 "• `/check_add` — verify channel permissions\n\n"
                 "👉 Get started: send `/run`"
             )
@@ -20,6 +29,7 @@ class Translator:
             self.run_prompt = (
                 "📄 Send the content you want to schedule (text, photo, or both)."
             )
+            self.channel_prompt = "📢 Choose the channel to post to:"
             self.duration_prompt = "⏱ Choose how long the progress bar should run:"
             self.custom_label = "Custom"
             self.custom_duration_prompt = (
@@ -32,9 +42,28 @@ class Translator:
             self.no_active_jobs = "❌ No active jobs to cancel."
             self.select_job_to_cancel = "🗑 Select a job to cancel:"
             self.cancel_selection_label = "❌ Cancel selection"
+            self.prev_page_label = "◀️ Back"
+            self.import_prompt = (
+                "📥 Send a `.json` or `.csv` file of posts as a document.\n\n"
+                "Fields: `text` and/or `photo` (file_id), `minutes` until publishing "
+                "or `at` (ISO time, UTC unless an offset is given, or Unix time), optional `channel`. "
+                "Add `repeat` (as in /repeat) to make a post recurring; `minutes` is then the countdown before each run."
+            )
+            self.repeat_prompt = (
+                "🔁 How often should the post go out?\n\n"
+                "• `every 6h` (also `30m`, `2d`)\n"
+                "• `daily 09:00` or `daily 09:00, 18:30`\n"
+                "• a cron expression, e.g. `0 9 * * 1` (Mondays at 09:00)"
+            )
+            self.no_schedules = "❌ No recurring posts."
+            self.select_schedule_to_stop = "🔁 Recurring posts, tap one to stop it:"
+            self.schedule_not_found = "❌ Recurring post not found (may have already been stopped)."
+            self.import_needs_document = "⚠️ Please send the posts as a document (.json or .csv)."
+            self.next_page_label = "Next ▶️"
             self.cancellation_cancelled = "❌ Cancellation cancelled."
             self.job_not_found = "❌ Job not found (may have already completed)."
             self.media_post_label = "[Media post]"
+            self.dashboard_header = "📅 Upcoming posts"
             self.test_message_text = "🤖 Access test — will be edited and deleted"
 
             # Access check labels
@@ -90,7 +119,10 @@ class Translator:
                 "Планируйте публикации в канал с живым progress bar до выхода поста.\n\n"
                 "📋 Доступные команды:\n"
                 "• `/run` — запланировать новый пост\n"
-                "• `/cancel` — посмотреть/отменить активные задачи\n"
+                "• `/repeat` — запланировать повторяющийся пост\n"
+                "• `/schedules` — посмотреть/остановить повторяющиеся посты\n"
+                "• `/import` — запланировать много постов из файла JSON/CSV\n"
+                "• `/cancel [channel_id | текст]` — посмотреть/отменить активные задачи\n"
                 "• `/check_add` — проверить права в канале\n\n"
                 "👉 Начните с команды `/run`"
             )
@@ -98,6 +130,7 @@ class Translator:
             self.run_prompt = (
                 "📄 Отправьте содержание для публикации (текст, фото или оба варианта)."
             )
+            self.channel_prompt = "📢 Выберите канал для публикации:"
             self.duration_prompt = "⏱ Выберите длительность progress bar:"
             self.custom_label = "Свой вариант"
             self.custom_duration_prompt = (
@@ -110,9 +143,28 @@ class Translator:
             self.no_active_jobs = "❌ Нет активных задач для отмены."
             self.select_job_to_cancel = "🗑 Выберите задачу для отмены:"
             self.cancel_selection_label = "❌ Отменить выбор"
+            self.prev_page_label = "◀️ Назад"
+            self.import_prompt = (
+                "📥 Отправьте файл постов `.json` или `.csv` документом.\n\n"
+                "Поля: `text` и/или `photo` (file_id), `minutes` до публикации "
+                "или `at` (время ISO, UTC если не указано смещение, или Unix time), необязательно `channel`. "
+                "Поле `repeat` (как в /repeat) делает пост повторяющимся; `minutes` тогда — отсчёт перед каждым выходом."
+            )
+            self.repeat_prompt = (
+                "🔁 Как часто публиковать пост?\n\n"
+                "• `every 6h` (также `30m`, `2d`)\n"
+                "• `daily 09:00` или `daily 09:00, 18:30`\n"
+                "• cron‑выражение, например `0 9 * * 1` (по понедельникам в 09:00)"
+            )
+            self.no_schedules = "❌ Нет повторяющихся постов."
+            self.select_schedule_to_stop = "🔁 Повторяющиеся посты, нажмите, чтобы остановить:"
+            self.schedule_not_found = "❌ Повторяющийся пост не найден (возможно уже остановлен)."
+            self.import_needs_document = "⚠️ Отправьте посты документом (.json или .csv)."
+            self.next_page_label = "Далее ▶️"
             self.cancellation_cancelled = "❌ Отмена прервана."
             self.job_not_found = "❌ Задача не найдена (возможно уже завершена)."
             self.media_post_label = "[Пост с медиа]"
+            self.dashboard_header = "📅 Ближайшие публикации"
             self.test_message_text = "🤖 Тест доступа — будет отредактировано и удалено"
 
             # Access check labels
@@ -178,6 +230,18 @@ class Translator:
                 word = "минут"
             return f"{n} {word}"
 
+    def import_failed_text(self, errors: list, shown: int = 10) -> str:
+        lines = errors[:shown]
+        if len(errors) > shown:
+            lines.append(f"… +{len(errors) - shown}")
+        title = ("⚠️ Nothing imported, fix the file and send it again:" if self.lang == "en"
+                 else "⚠️ Ничего не импортировано, исправьте файл и отправьте снова:")
+        return "\n".join([title] + lines)
+
+    def import_done_text(self, count: int) -> str:
+        return (f"✅ Imported {count} posts; progress bars are being created." if self.lang == "en"
+                else f"✅ Импортировано постов: {count}; прогресс-бары создаются.")
+
     def scheduled_in_minutes(self, minutes: int) -> str:
         if self.lang == "en":
             return f"✅ Scheduled! The post will go out in {minutes} {'minute' if minutes == 1 else 'minutes'}."
@@ -192,6 +256,45 @@ class Translator:
                 word = "минут"
             return f"✅ Запланировано! Публикация через {minutes} {word}."
 
+    def select_job_page_text(self, page: int) -> str:
+        if page == 1:
+            return self.select_job_to_cancel
+        return (f"{self.select_job_to_cancel} (page {page})" if self.lang == "en"
+                else f"{self.select_job_to_cancel} (стр. {page})")
+
+    def channel_not_ready_text(self, chat_id, missing: list, error: str = None) -> str:
+        """Why a post can't be scheduled in a channel: the missing rights, or the error reaching it."""
+        if self.lang == "en":
+            reason = error or f"missing rights: {', '.join(missing)}"
+            return f"⛔ Can't schedule in {chat_id}: {reason}. Fix the bot's rights and check with /check_add {chat_id}."
+        reason = error or f"нет прав: {', '.join(missing)}"
+        return f"⛔ Нельзя запланировать в {chat_id}: {reason}. Исправьте права бота и проверьте через /check_add {chat_id}."
+
+    def repeat_invalid_text(self, error: str) -> str:
+        return (f"⚠️ Not understood: {error}. Try again, e.g. 'every 6h'." if self.lang == "en"
+                else f"⚠️ Не удалось разобрать: {error}. Попробуйте ещё раз, например 'every 6h'.")
+
+    def repeat_created_text(self, spec: str, next_run: str) -> str:
+        return (f"✅ Recurring post saved ({spec}). Next run: {next_run}." if self.lang == "en"
+                else f"✅ Повторяющийся пост сохранён ({spec}). Следующий выход: {next_run}.")
+
+    def select_schedule_page_text(self, page: int) -> str:
+        if page == 1:
+            return self.select_schedule_to_stop
+        return (f"{self.select_schedule_to_stop} (page {page})" if self.lang == "en"
+                else f"{self.select_schedule_to_stop} (стр. {page})")
+
+    def schedule_stopped_text(self, text: str, spec: str) -> str:
+        return (f"✅ Recurring post stopped ({spec}): {text}" if self.lang == "en"
+                else f"✅ Повторяющийся пост остановлен ({spec}): {text}")
+
+    def quota_exceeded_text(self, active: int, limit: int) -> str:
+        if self.lang == "en":
+            return (f"⛔ You have {active} active posts, the limit is {limit}. "
+                    f"Wait for some to be published or cancel them with /cancel.")
+        return (f"⛔ У вас активных постов: {active}, лимит — {limit}. "
+                f"Дождитесь публикации части из них или отмените их через /cancel.")
+
     def job_cancelled_text(self, text: str) -> str:
         return (f"✅ Job cancelled: {text}" if self.lang == "en"
                 else f"✅ Задача отменена: {text}")
@@ -211,6 +314,12 @@ class Translator:
             return self.less_than_a_minute if self.lang == "en" else self.less_than_a_minute
 
         minutes = math.ceil(seconds / 60)
+        if minutes >= 1440:
+            # Only days and hours are shown: share one cache entry per hour
+            minutes -= minutes % 60
+        return self._format_minutes(minutes)
+
+    def _format_minutes_uncached(self, minutes: int) -> str:
         days = minutes // 1440
         hours = (minutes % 1440) // 60
         mins = minutes % 60
@@ -234,6 +343,23 @@ class Translator:
                 parts.append(f"{mins} {self._ru_plural(mins, self.minute_s, self.minute_f, self.minute_m)}")
             return " ".join(parts)
 
+    def time_left_changes_at(self, seconds: float) -> float:
+        """
+        Remaining seconds at which format_time_left output next changes.
+        The countdown runs downwards, so the result is below ``seconds``
+        (0 when the text stays the same until the end).
+        """
+        if seconds < 60:
+            return 0.0
+        minutes = math.ceil(seconds / 60)
+        if minutes == 1:
+            # Exactly one minute left; the next change is to "<1 minute"
+            return math.nextafter(60.0, 0.0)
+        if minutes >= 1440:
+            # Days and hours are shown, minutes are not
+            return (minutes // 60) * 3600 - 60.0
+        return (minutes - 1) * 60.0
+
 
-def get_translator(lang: str) -> Translator:
-    return Translator(lang)
+def get_translator(lang: str, time_left_cache_size: int = TIME_LEFT_CACHE_SIZE) -> Translator:
+    return Translator(lang, time_left_cache_size)
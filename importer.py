@@ -0,0 +1,111 @@
+import csv
+import datetime
+import io
+import json
+import math
+
+from recurrence import parse_recurrence
+
+MAX_IMPORT_POSTS = 1000   # Posts accepted from one file
+MAX_IMPORT_BYTES = 1 << 20
+
+
+class ImportedPost:
+    """One validated row of a bulk import file."""
+
+    __slots__ = ('chat_id', 'post_text', 'media', 'duration', 'repeat')
+
+    def __init__(self, chat_id, post_text: str, media: dict, duration: float, repeat: str = None):
+        self.chat_id = chat_id
+        self.post_text = post_text
+        self.media = media
+        self.duration = duration
+        self.repeat = repeat  # Recurrence spec; duration is then the countdown before each run
+
+
+def _read_rows(filename: str, data: bytes) -> list:
+    """Raw rows of a JSON (list of objects) or CSV (with a header line) file."""
+    text = data.decode('utf-8-sig')
+    if filename.lower().endswith('.csv'):
+        return list(csv.DictReader(io.StringIO(text)))
+    rows = json.loads(text)
+    if isinstance(rows, dict):
+        rows = rows.get('posts')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError("expected a list of objects (or {\"posts\": [...]})")
+    return rows
+
+
+def _parse_at(value, now: float) -> float:
+    """Seconds from ``now`` until ``value``: a Unix timestamp or ISO 8601 time (UTC if no offset)."""
+    try:
+        at = float(value)
+    except (TypeError, ValueError):
+        moment = datetime.datetime.fromisoformat(str(value).strip())
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        at = moment.timestamp()
+    return at - now
+
+
+def _parse_row(row: dict, default_chat_id, channels: list, parse_chat_id, now: float) -> ImportedPost:
+    def field(name):
+        value = row.get(name)
+        return value.strip() if isinstance(value, str) else value
+
+    text = row.get('text') or ''
+    photo = field('photo')
+    if not str(text).strip() and not photo:
+        raise ValueError("needs 'text' or 'photo'")
+
+    minutes, at, repeat = field('minutes'), field('at'), field('repeat')
+    if repeat:
+        if at or not minutes:
+            raise ValueError("'repeat' needs 'minutes' (the countdown before each run) and no 'at'")
+        repeat = parse_recurrence(str(repeat)).spec
+    if bool(minutes) == bool(at):
+        raise ValueError("needs exactly one of 'minutes' or 'at'")
+    if minutes:
+        duration = float(minutes) * 60
+    else:
+        duration = _parse_at(at, now)
+    if not math.isfinite(duration):
+        raise ValueError("publish time is out of range")
+    if not duration > 0:
+        raise ValueError("publish time must be in the future")
+
+    channel = field('channel')
+    chat_id = parse_chat_id(str(channel)) if channel else default_chat_id
+    if chat_id not in channels:
+        raise ValueError(f"channel {chat_id} is not configured")
+
+    media = {'type': 'photo', 'file_id': photo} if photo else None
+    return ImportedPost(chat_id, str(text), media, duration, repeat or None)
+
+
+def parse_import(filename: str, data: bytes, default_chat_id, channels: list, parse_chat_id, now: float):
+    """
+    Validate a bulk import file. Each row has ``text`` and/or ``photo`` (a Telegram
+    file_id), either ``minutes`` until publishing or ``at`` (Unix time or ISO 8601),
+    and optionally ``channel``. Rows with ``repeat`` (a recurrence, see parse_recurrence)
+    are recurring posts and use ``minutes`` as the countdown before each run.
+    :return: (posts, errors); errors are human-readable lines, posts is empty if there are any
+    """
+    if len(data) > MAX_IMPORT_BYTES:
+        return [], [f"file is larger than {MAX_IMPORT_BYTES // 1024} KB"]
+    try:
+        rows = _read_rows(filename, data)
+    except (ValueError, csv.Error) as e:
+        return [], [f"cannot read file: {e}"]
+    if not rows:
+        return [], ["file has no posts"]
+    if len(rows) > MAX_IMPORT_POSTS:
+        return [], [f"file has {len(rows)} posts, the limit is {MAX_IMPORT_POSTS}"]
+
+    posts, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            posts.append(_parse_row(row, default_chat_id, channels, parse_chat_id, now))
+        except (ValueError, TypeError) as e:
+            errors.append(f"#{number}: {e}")
+    return ([] if errors else posts), errors
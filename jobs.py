@@ -0,0 +1,68 @@
+class ProgressJob:
+    """
+    In-memory state of one running progress bar.
+
+    Only what ticking needs is kept: a fixed set of slots per job. The post
+    body and media stay in the job store until publish time.
+    """
+
+    __slots__ = ('job_id', 'chat_id', 'message_id', 'duration', 'deadline', 'step_pct', 'interval',
+                 'title', 'elapsed', 'progress', 'last_progress', 'last_left', 'publish_skew',
+                 'weight', 'cancelled', 'user_id')
+
+    def __init__(self, job_id: int, chat_id, message_id: int, duration: float, deadline: float,
+                 step_pct: int, interval: float, title: str = None, user_id: int = None):
+        self.job_id = job_id
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.duration = duration
+        # Monotonic (loop time) instant the post is due; progress is derived from it
+        self.deadline = deadline
+        self.step_pct = step_pct
+        self.interval = interval
+        self.title = title  # Short label of the post, only kept for dashboard lines
+        self.user_id = user_id  # Who scheduled it: the tenant its API calls are queued for
+        self.elapsed = 0.0
+        self.progress = 0
+        # Bar percentage and time-left label last handed to Telegram
+        self.last_progress = None
+        self.last_left = None
+        self.publish_skew = None  # Actual minus scheduled publish time, seconds
+        self.weight = 0.0  # Share of the chat's edit budget, maintained by CadenceController
+        # Set by JobRegistry.cancel, checked by the scheduler
+        self.cancelled = False
+
+
+class JobRegistry:
+    """Index of the jobs running in this process, by job id."""
+
+    def __init__(self):
+        self._jobs = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, job_id: int) -> bool:
+        return job_id in self._jobs
+
+    def __iter__(self):
+        return iter(list(self._jobs.values()))
+
+    def register(self, job: ProgressJob) -> None:
+        self._jobs[job.job_id] = job
+
+    def unregister(self, job_id: int) -> None:
+        self._jobs.pop(job_id, None)
+
+    def get(self, job_id: int):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: int):
+        """
+        Signal a running job to stop and drop it from the registry.
+        :return: The cancelled job, or None if it is not running here
+        """
+        job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancelled = True
+        return job
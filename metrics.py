@@ -0,0 +1,196 @@
+import asyncio
+import bisect
+import math
+
+# Latency buckets (seconds) shared by API, DB and lag histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SKEW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_METRICS = []  # Every metric, in registration (= exposition) order
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        _METRICS.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labels)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name, _format_labels(self.labels, key), value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Current value; either set explicitly or read from a callback at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        super().__init__(name, help_text, labels)
+        self._function = None
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function) -> None:
+        """Compute the (unlabelled) value by calling ``function()`` on every scrape."""
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            yield self.name, '', self._function()
+        else:
+            yield from super()._samples()
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus sum and count, as Prometheus expects."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, +Inf last, then the running sum
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def _samples(self):
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket", _format_labels(self.labels, key, le), cumulative
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+def render() -> bytes:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return ('\n'.join(lines) + '\n').encode()
+
+
+# =====================
+# Metrics
+# =====================
+ACTIVE_JOBS = Gauge('progress_active_jobs', 'Progress bars running in this process')
+SCHEDULER_JOBS = Gauge('progress_scheduler_jobs', 'Entries in the scheduler heaps')
+SCHEDULER_DUE_JOBS = Gauge('progress_scheduler_due_jobs', 'Scheduler entries already due but not yet handled')
+SCHEDULER_OVERDUE = Gauge('progress_scheduler_overdue_seconds', 'How long the oldest due scheduler entry has waited')
+TICK_LATENESS = Histogram('progress_tick_lateness_seconds', 'Delay between a tick falling due and its batch starting')
+OUTBOUND_QUEUED = Gauge('progress_outbound_queued_requests', 'API requests waiting in the outbound queue')
+CADENCE_BACKOFF = Gauge('progress_cadence_backoff', 'Largest edit gap multiplier applied after rejections')
+API_LATENCY = Histogram('progress_api_request_seconds', 'Bot API call latency', ('method',))
+API_ERRORS = Counter('progress_api_errors_total', 'Failed Bot API calls', ('method', 'error'))
+RETRY_AFTER = Counter('progress_api_retry_after_total', 'RetryAfter (HTTP 429) responses', ('method',))
+RETRY_AFTER_SECONDS = Counter('progress_api_retry_after_seconds_total', 'Seconds of flood wait requested by Telegram')
+DB_LATENCY = Histogram('progress_db_query_seconds', 'Job store round trip, including the wait for the DB thread', ('op',))
+LOOP_LAG = Histogram('progress_event_loop_lag_seconds', 'How late a periodic timer fires on the event loop')
+PUBLISH_SKEW = Histogram('progress_publish_skew_seconds', 'Actual minus scheduled publish time', buckets=SKEW_BUCKETS)
+PUBLISH_RETRIES = Counter('progress_publish_retries_total', 'Failed publish attempts left in the outbox for a retry')
+HANDLER_ERRORS = Counter('progress_handler_errors_total', 'Unhandled exceptions in update handlers')
+
+
+class LoopLagMonitor:
+    """
+    Measure event-loop lag by sleeping for a fixed interval and recording how
+    much later than requested the loop woke up.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(loop.time() - expected, 0.0)
+            LOOP_LAG.observe(self.last_lag)
+
+
+def make_metrics_handler(health):
+    """
+    Build an HTTPServer handler serving ``GET /metrics`` and ``GET /healthz``.
+    :param health: Callable returning a list of problems; empty means healthy
+    """
+
+    async def handle(method: str, target: str, headers: dict, body: bytes):
+        if method != 'GET':
+            return 405, 'text/plain', b'method not allowed'
+        if target == '/metrics':
+            return 200, 'text/plain; version=0.0.4; charset=utf-8', render()
+        if target == '/healthz':
+            problems = health()
+            if problems:
+                return 503, 'text/plain', ('\n'.join(problems) + '\n').encode()
+            return 200, 'text/plain', b'ok\n'
+        return 404, 'text/plain', b'not found'
+
+    return handle
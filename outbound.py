@@ -0,0 +1,371 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+
+from telegram.error import BadRequest, RetryAfter
+
+from metrics import API_ERRORS, API_LATENCY, RETRY_AFTER, RETRY_AFTER_SECONDS
+
+# Lower value = sent first. Final publishes and deletes always beat cosmetic edits.
+PRIORITY_PUBLISH = 0
+PRIORITY_DELETE = 1
+PRIORITY_SEND = 2
+PRIORITY_EDIT = 3
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """Normalize RetryAfter.retry_after (int or timedelta) to seconds."""
+    value = error.retry_after
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1 - 1e-9:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _Request:
+    __slots__ = ('priority', 'tag', 'seq', 'method', 'chat_id', 'kwargs', 'future', 'edit_key')
+
+    def __init__(self, priority, tag, seq, method, chat_id, kwargs, future, edit_key=None):
+        self.priority = priority
+        self.tag = tag  # Fair-queuing start tag within the priority, see OutboundQueue._tag
+        self.seq = seq
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.future = future
+        self.edit_key = edit_key
+
+    def __lt__(self, other):
+        return (self.priority, self.tag, self.seq) < (other.priority, other.tag, other.seq)
+
+
+class _Pool:
+    """A bot (connection pool) with its own in-flight limit, and the ready lanes whose next request uses it."""
+
+    __slots__ = ('bot', 'slots', 'ready')
+
+    def __init__(self, bot, max_in_flight: int):
+        self.bot = bot
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.ready = []  # (priority, tag, seq, lane)
+
+
+class _ChatLane:
+    """Pending requests and rate state of one destination chat."""
+
+    IDLE, WAITING, READY = range(3)
+
+    def __init__(self, chat_id, bucket: TokenBucket):
+        self.chat_id = chat_id
+        self.bucket = bucket
+        self.queue = []
+        self.blocked_until = 0.0
+        self.state = self.IDLE
+
+    def ready_at(self, now: float) -> float:
+        return max(now + self.bucket.delay(now), self.blocked_until)
+
+
+class OutboundQueue:
+    """
+    Shared, rate-limited queue for every Bot API call aimed at a channel.
+
+    Each destination chat has its own token bucket and priority queue, and a
+    global bucket caps the bot as a whole. Pending edits of the same message
+    are coalesced into the latest text, RetryAfter pauses the affected chat
+    for the requested time, and publishes/deletes are always dispatched ahead
+    of progress bar edits.
+
+    If ``feedback`` is given it is called as ``feedback(chat_id, ok)`` after
+    every call, so senders can adapt their own pace to rejections, and
+    ``on_error(chat_id, method, error)`` is called for every failed call
+    except flood control. Requests
+    of a given priority can be routed through a separate bot (and with it a
+    separate connection pool) and in-flight limit with ``add_pool``. Ready
+    lanes are kept per pool and a pool with no free slot is simply passed
+    over, so a saturated pool never holds up requests bound for another.
+
+    Within a priority, requests are shared fairly between tenants (the users
+    who scheduled the posts) by start-time fair queuing: each request is
+    tagged with its tenant's virtual start time, which advances by
+    ``1 / weight`` per request, and the lowest tag is sent first, both inside
+    a chat and across chats. A tenant with hundreds of queued calls gets its
+    weighted share of the rate instead of the whole queue, and a tenant with
+    one pending publish is served almost at once.
+    """
+
+    def __init__(self, bot, global_rate: float = 25.0, chat_rate: float = 20 / 60,
+                 chat_burst: float = 3, max_in_flight: int = 16, feedback=None, on_error=None,
+                 tenant_weights: dict = None):
+        """
+        :param tenant_weights: Share of the rate per tenant (default 1); requests without a tenant
+            (e.g. dashboards shared by everyone) are one tenant of their own
+        """
+        self.bot = bot
+        self.tenant_weights = tenant_weights or {}
+        self.feedback = feedback
+        self.on_error = on_error
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._seq = itertools.count()
+        self._lanes = {}
+        self._edits = {}
+        self._vtime = {}    # priority -> start tag of the request sent last
+        self._finish = {}   # (priority, tenant) -> virtual time the tenant's next request starts at
+        self._waiting = []  # (ready_at, seq, lane)
+        self._global = None
+        self._default_pool = _Pool(bot, max_in_flight)
+        self._pools = {}  # priority -> _Pool
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._queued = 0
+
+    def __len__(self) -> int:
+        """Number of requests waiting to be dispatched."""
+        return self._queued
+
+    # ---------- Public API ----------
+    def start(self) -> None:
+        if self._task is None:
+            self._global = TokenBucket(self.global_rate, self.global_rate, self._now())
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def add_pool(self, priority: int, bot, max_in_flight: int) -> None:
+        """Send requests of ``priority`` through ``bot`` with their own in-flight limit."""
+        self._pools[priority] = _Pool(bot, max_in_flight)
+
+    async def call(self, priority: int, method: str, chat_id, tenant=None, **kwargs):
+        """Queue ``bot.<method>(chat_id=chat_id, **kwargs)`` on behalf of ``tenant`` and await its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._push(_Request(priority, self._tag(priority, tenant), next(self._seq), method, chat_id, kwargs, future))
+        return await future
+
+    def edit_text(self, chat_id, message_id: int, text: str, tenant=None) -> None:
+        """Queue a progress bar edit; replaces any edit of that message not yet sent."""
+        key = (chat_id, message_id)
+        pending = self._edits.get(key)
+        if pending is not None:
+            pending.kwargs['text'] = text
+            return
+        request = _Request(PRIORITY_EDIT, self._tag(PRIORITY_EDIT, tenant), next(self._seq),
+                           'edit_message_text', chat_id, {'message_id': message_id, 'text': text}, None, key)
+        self._edits[key] = request
+        self._push(request)
+
+    def discard_edits(self, chat_id, message_id: int) -> None:
+        """Drop a pending edit, e.g. because the message is about to be deleted."""
+        request = self._edits.pop((chat_id, message_id), None)
+        if request is not None:
+            request.kwargs = None
+
+    # ---------- Fair queuing ----------
+    def _tag(self, priority: int, tenant) -> float:
+        """
+        Start tag of a new request: the tenant's virtual finish time, or the current
+        virtual time if the tenant has fallen behind it (was idle), so idle tenants
+        can't save up credit. Each request then advances the tenant by 1 / weight.
+        """
+        key = (priority, tenant)
+        tag = max(self._vtime.get(priority, 0.0), self._finish.get(key, 0.0))
+        self._finish[key] = tag + 1.0 / self.tenant_weights.get(tenant, 1.0)
+        return tag
+
+    def _advance(self, request: _Request) -> None:
+        """Move the virtual time of a priority to the tag of the request just sent."""
+        vtime = self._vtime.get(request.priority, 0.0)
+        if request.tag > vtime:
+            self._vtime[request.priority] = request.tag
+            if len(self._finish) > 4 * len(self.tenant_weights) + 1024:
+                # Tenants behind the virtual time start from it anyway
+                self._finish = {key: finish for key, finish in self._finish.items()
+                                if finish > self._vtime.get(key[0], 0.0)}
+
+    # ---------- Lanes ----------
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def _lane(self, chat_id) -> _ChatLane:
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, self._now())
+            lane = self._lanes[chat_id] = _ChatLane(chat_id, bucket)
+        return lane
+
+    def _pool(self, priority: int) -> _Pool:
+        return self._pools.get(priority, self._default_pool)
+
+    def _push(self, request: _Request) -> None:
+        lane = self._lane(request.chat_id)
+        heapq.heappush(lane.queue, request)
+        self._queued += 1
+        if lane.state == _ChatLane.IDLE:
+            self._arm(lane, self._now())
+        elif lane.state == _ChatLane.READY and lane.queue[0] is request:
+            # Earlier head: add a fresher entry, the old one turns stale
+            heapq.heappush(self._pool(request.priority).ready, (request.priority, request.tag, next(self._seq), lane))
+            self._wakeup.set()
+
+    def _arm(self, lane: _ChatLane, now: float) -> None:
+        """Place a non-empty lane into the ready or waiting heap."""
+        ready_at = lane.ready_at(now)
+        if ready_at <= now:
+            lane.state = _ChatLane.READY
+            head = lane.queue[0]
+            heapq.heappush(self._pool(head.priority).ready, (head.priority, head.tag, next(self._seq), lane))
+        else:
+            lane.state = _ChatLane.WAITING
+            heapq.heappush(self._waiting, (ready_at, next(self._seq), lane))
+        self._wakeup.set()
+
+    # ---------- Dispatch loop ----------
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = self._now()
+            while self._waiting and self._waiting[0][0] <= now:
+                lane = heapq.heappop(self._waiting)[2]
+                self._arm(lane, now)
+
+            pool = self._next_pool()
+            if pool is None:
+                # Nothing ready, or only lanes waiting for a slot (a finished call wakes us)
+                timeout = self._waiting[0][0] - now if self._waiting else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self._global.delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            lane = heapq.heappop(pool.ready)[3]
+            if lane.ready_at(now) > now:
+                self._arm(lane, now)
+                continue
+
+            request = heapq.heappop(lane.queue)
+            self._queued -= 1
+            self._advance(request)
+            if request.edit_key is not None:
+                if request.kwargs is None:
+                    self._rearm(lane, now)
+                    continue  # discarded edit
+                self._edits.pop(request.edit_key, None)
+
+            await pool.slots.acquire()  # Free, so this doesn't wait
+            lane.bucket.consume(now)
+            self._global.consume(now)
+            self._rearm(lane, now)
+            asyncio.create_task(self._dispatch(lane, request, pool.bot, pool.slots))
+
+    def _next_pool(self):
+        """The pool with a free slot whose first ready lane goes next, or None."""
+        best = None
+        for pool in (self._default_pool, *self._pools.values()):
+            ready = pool.ready
+            while ready:
+                priority, tag, _, lane = ready[0]
+                if lane.state == _ChatLane.READY and lane.queue and \
+                        (lane.queue[0].priority, lane.queue[0].tag) == (priority, tag):
+                    break
+                heapq.heappop(ready)  # stale entry
+            if ready and not pool.slots.locked() and (best is None or ready[0] < best.ready[0]):
+                best = pool
+        return best
+
+    def _rearm(self, lane: _ChatLane, now: float) -> None:
+        if lane.queue:
+            self._arm(lane, now)
+        else:
+            lane.state = _ChatLane.IDLE
+
+    async def _dispatch(self, lane: _ChatLane, request: _Request, bot, slots: asyncio.Semaphore) -> None:
+        started = self._now()
+        ok = False
+        try:
+            result = await getattr(bot, request.method)(chat_id=request.chat_id, **request.kwargs)
+        except RetryAfter as e:
+            delay = retry_after_seconds(e)
+            RETRY_AFTER.inc(method=request.method)
+            RETRY_AFTER_SECONDS.inc(delay)
+            logging.warning(f"Flood control in chat {lane.chat_id}: retrying in {delay}s")
+            lane.blocked_until = max(lane.blocked_until, self._now() + delay)
+            self._requeue(request)
+        except BadRequest as e:
+            if request.edit_key is not None and 'message is not modified' in str(e).lower():
+                ok = True  # Telegram already shows this text
+            else:
+                API_ERRORS.inc(method=request.method, error='BadRequest')
+                if self.on_error is not None:
+                    self.on_error(lane.chat_id, request.method, e)
+                if request.future is not None:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                else:
+                    logging.warning(f"Edit failed: {e}")
+        except Exception as e:
+            API_ERRORS.inc(method=request.method, error=type(e).__name__)
+            if self.on_error is not None:
+                self.on_error(lane.chat_id, request.method, e)
+            if request.future is not None:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            else:
+                logging.warning(f"Edit failed: {e}")
+        else:
+            ok = True
+            if request.future is not None and not request.future.done():
+                request.future.set_result(result)
+        finally:
+            API_LATENCY.observe(self._now() - started, method=request.method)
+            slots.release()
+            self._wakeup.set()
+            if self.feedback is not None:
+                self.feedback(lane.chat_id, ok)
+
+    def _requeue(self, request: _Request) -> None:
+        if request.edit_key is not None:
+            if request.edit_key in self._edits:
+                return  # a newer edit of this message is already queued
+            self._edits[request.edit_key] = request
+        self._push(request)
@@ -0,0 +1,159 @@
+import datetime
+import functools
+import math
+import re
+
+MAX_SEARCH_DAYS = 366 * 5   # A cron expression with no match this far ahead never matches (e.g. 30 February)
+
+_UNITS = {'m': 60, 'min': 60, 'minute': 60, 'minutes': 60,
+          'h': 3600, 'hour': 3600, 'hours': 3600,
+          'd': 86400, 'day': 86400, 'days': 86400}
+_EVERY = re.compile(r'every\s+(\d+)\s*([a-z]+)')
+_CLOCK = re.compile(r'(\d{1,2}):(\d{2})')
+
+
+def _first_minute(previous: float, not_before: float, tz) -> datetime.datetime:
+    """Naive wall-clock time in ``tz`` of the first whole minute after ``previous`` and not before ``not_before``."""
+    ts = max(math.floor(previous / 60) * 60 + 60, math.ceil(not_before / 60) * 60)
+    return datetime.datetime.fromtimestamp(ts, tz).replace(tzinfo=None)
+
+
+def _timestamp(moment: datetime.datetime, tz) -> float:
+    return moment.replace(tzinfo=tz).timestamp()
+
+
+class Interval:
+    """``every N m|h|d``: occurrences a fixed number of seconds apart, counted from the first one."""
+
+    __slots__ = ('spec', 'seconds')
+
+    def __init__(self, spec: str, seconds: int):
+        self.spec = spec
+        self.seconds = seconds
+
+    def next_after(self, previous: float, not_before: float) -> float:
+        steps = max(math.ceil((not_before - previous) / self.seconds), 1)
+        return previous + steps * self.seconds
+
+
+class DailyTimes:
+    """``daily HH:MM[, HH:MM...]``: fixed wall-clock times every day."""
+
+    __slots__ = ('spec', 'times', 'tz')
+
+    def __init__(self, spec: str, times: list, tz):
+        self.spec = spec
+        self.times = sorted(times)
+        self.tz = tz
+
+    def next_after(self, previous: float, not_before: float):
+        start = _first_minute(previous, not_before, self.tz)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(2):
+            for hour, minute in self.times:
+                moment = day.replace(hour=hour, minute=minute)
+                if moment >= start:
+                    return _timestamp(moment, self.tz)
+            day += datetime.timedelta(days=1)
+        return None
+
+
+def _cron_field(text: str, low: int, high: int) -> frozenset:
+    """Values of one cron field: ``*``, numbers, ``a-b`` ranges and ``/step``, comma-separated."""
+    values = set()
+    for part in text.split(','):
+        base, _, step = part.partition('/')
+        try:
+            step = int(step) if step else 1
+            if base == '*':
+                first, last = low, high
+            elif '-' in base:
+                first, last = (int(v) for v in base.split('-', 1))
+            else:
+                first = int(base)
+                last = high if step > 1 else first
+        except ValueError:
+            raise ValueError(f"'{part}' is not a number, range or step") from None
+        if not (low <= first <= last <= high) or step < 1:
+            raise ValueError(f"'{part}' is out of range {low}-{high}")
+        values.update(range(first, last + 1, step))
+    return frozenset(values)
+
+
+class Cron:
+    """A five-field cron expression (minute hour day-of-month month day-of-week), in wall-clock time."""
+
+    __slots__ = ('spec', 'minutes', 'hours', 'days', 'months', 'weekdays', 'any_day', 'any_weekday', 'tz')
+
+    def __init__(self, spec: str, fields: list, tz):
+        if len(fields) != 5:
+            raise ValueError("a cron expression has 5 fields: minute hour day month weekday")
+        self.spec = spec
+        self.minutes = _cron_field(fields[0], 0, 59)
+        self.hours = _cron_field(fields[1], 0, 23)
+        self.days = _cron_field(fields[2], 1, 31)
+        self.months = _cron_field(fields[3], 1, 12)
+        # Cron counts weekdays from Sunday = 0 (7 is Sunday too); Python from Monday = 0
+        self.weekdays = frozenset((day - 1) % 7 for day in _cron_field(fields[4], 0, 7))
+        # As in cron, a field starting with '*' (also '*/2') doesn't restrict the day on its own
+        self.any_day = fields[2].startswith('*')
+        self.any_weekday = fields[4].startswith('*')
+        self.tz = tz
+
+    def _day_matches(self, moment: datetime.datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = moment.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok  # Both restricted: either one matches, as in cron
+
+    def next_after(self, previous: float, not_before: float):
+        moment = _first_minute(previous, not_before, self.tz)
+        last = moment + datetime.timedelta(days=MAX_SEARCH_DAYS)
+        # Skip whole months, days and hours that can't match instead of stepping minute by minute
+        while moment < last:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            else:
+                minute = min((m for m in self.minutes if m >= moment.minute), default=None)
+                if minute is not None:
+                    return _timestamp(moment.replace(minute=minute), self.tz)
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_recurrence(spec: str, tz=datetime.timezone.utc):
+    """
+    Parse a recurrence: ``every 6h`` (also ``m``/``d`` and spelled-out units),
+    ``daily 09:00, 18:30``, or a cron expression, optionally prefixed with ``cron``.
+    Wall-clock times are in ``tz``. Parsed schedules are cached by spec.
+    :return: Interval, DailyTimes or Cron; each has ``spec`` and ``next_after(previous, not_before)``
+    :raises ValueError: If the spec is not understood
+    """
+    text = ' '.join(spec.lower().split())
+    if text.startswith('every'):
+        match = _EVERY.fullmatch(text)
+        if not match or match.group(2) not in _UNITS or int(match.group(1)) <= 0:
+            raise ValueError(f"'{spec}': expected e.g. 'every 6h', 'every 30m' or 'every 2d'")
+        return Interval(text, int(match.group(1)) * _UNITS[match.group(2)])
+    if text.startswith('daily'):
+        times = []
+        for part in text[len('daily'):].replace(',', ' ').split():
+            match = _CLOCK.fullmatch(part)
+            if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+                raise ValueError(f"'{part}': expected a time like 09:00")
+            times.append((int(match.group(1)), int(match.group(2))))
+        if not times:
+            raise ValueError(f"'{spec}': expected e.g. 'daily 09:00' or 'daily 09:00, 18:30'")
+        return DailyTimes(text, list(set(times)), tz)
+    if text.startswith('cron'):
+        text = text[len('cron'):].strip()
+    try:
+        return Cron(text, text.split(), tz)
+    except ValueError as e:
+        raise ValueError(f"'{spec}': {e}") from None
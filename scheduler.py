@@ -0,0 +1,159 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+from metrics import TICK_LATENESS
+
+
+class DeadlineScheduler:
+    """
+    Drive every scheduled job from a single timer task.
+
+    Jobs live in a heap keyed by the loop time of their next tick. The
+    scheduler sleeps until the earliest deadline, pops every entry that is
+    due and runs their handlers as one batch, so idle jobs cost a heap
+    entry instead of a live coroutine and timer each.
+
+    Jobs expose a ``cancelled`` flag; cancelled entries are dropped lazily
+    when they reach the head of the heap instead of being searched for.
+    """
+
+    def __init__(self, handler):
+        """
+        :param handler: Coroutine function ``handler(job)`` returning the loop
+            time of the job's next tick, or None when it is finished
+        """
+        self._handler = handler
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._batches = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def due_count(self, now: float) -> int:
+        """Entries (cancelled ones included) whose tick time has passed."""
+        return sum(1 for when, _, _ in self._heap if when <= now)
+
+    def overdue(self, now: float) -> float:
+        """Seconds the earliest entry has been due; stays near 0 while the timer keeps up."""
+        return max(now - self._heap[0][0], 0.0) if self._heap else 0.0
+
+    def schedule(self, job, delay: float = 0.0) -> None:
+        """Queue a job to be handled after ``delay`` seconds."""
+        self.schedule_at(job, asyncio.get_running_loop().time() + max(delay, 0.0))
+
+    def schedule_at(self, job, when: float) -> None:
+        """Queue a job to be handled at loop time ``when``."""
+        heapq.heappush(self._heap, (when, next(self._seq), job))
+        # Only an entry that became the new head changes how long to sleep
+        if self._heap[0][2] is job:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = loop.time()
+            batch = []
+            while self._heap and self._heap[0][0] <= now:
+                when, _, job = heapq.heappop(self._heap)
+                if not job.cancelled:
+                    TICK_LATENESS.observe(now - when)
+                    batch.append(job)
+            if not batch:
+                continue
+
+            # Run the batch off the timer task so slow API calls never delay
+            # the next wake-up; each job is re-queued as soon as its own tick is
+            # done, so a slow publish in the batch never holds up the others.
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch) -> None:
+        await asyncio.gather(*(self._tick(job) for job in batch))
+
+    async def _tick(self, job) -> None:
+        try:
+            result = await self._handler(job)
+        except Exception:
+            logging.exception("Job tick failed")
+            return
+        if result is not None and not job.cancelled:
+            self.schedule_at(job, result)
+
+
+class ShardedScheduler:
+    """
+    One DeadlineScheduler per destination channel.
+
+    Jobs are routed by ``job.chat_id``, so a channel with a deep backlog of
+    due ticks never delays the timers of another channel.
+    """
+
+    def __init__(self, handler):
+        self._handler = handler
+        self._shards = {}
+        self._started = False
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards.values())
+
+    def due_count(self, now: float) -> int:
+        return sum(shard.due_count(now) for shard in self._shards.values())
+
+    def overdue(self, now: float) -> float:
+        return max((shard.overdue(now) for shard in self._shards.values()), default=0.0)
+
+    def shard(self, chat_id) -> DeadlineScheduler:
+        shard = self._shards.get(chat_id)
+        if shard is None:
+            shard = self._shards[chat_id] = DeadlineScheduler(self._handler)
+            if self._started:
+                shard.start()
+        return shard
+
+    def schedule(self, job, delay: float = 0.0) -> None:
+        self.shard(job.chat_id).schedule(job, delay)
+
+    def schedule_at(self, job, when: float) -> None:
+        self.shard(job.chat_id).schedule_at(job, when)
+
+    def start(self) -> None:
+        self._started = True
+        for shard in self._shards.values():
+            shard.start()
+
+    async def stop(self) -> None:
+        self._started = False
+        for shard in self._shards.values():
+            await shard.stop()
@@ -0,0 +1,614 @@
+import asyncio
+import json
+import logging
+import math
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import DB_LATENCY
+
+
+# =====================
+# Schema migrations
+# =====================
+# Each migration runs once, in its own transaction; append new ones, never edit old ones.
+
+# Indexed expression for prefix search; queries must repeat it verbatim for SQLite to use the index.
+# lower() folds ASCII only, like LIKE, so both agree on what matches.
+TEXT_KEY = "lower(substr(post_text, 1, 64))"
+
+
+def _migration_1(conn: sqlite3.Connection) -> None:
+    """Base jobs table (also adopts databases created before versioning)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            post_text TEXT,
+            media TEXT,
+            duration INTEGER NOT NULL,
+            start_time INTEGER NOT NULL,
+            status TEXT DEFAULT 'active'
+        )
+    ''')
+    # Older DBs predate the status column
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(jobs)")]
+    if 'status' not in cols:
+        conn.execute("ALTER TABLE jobs ADD COLUMN status TEXT DEFAULT 'active'")
+
+
+def _migration_2(conn: sqlite3.Connection) -> None:
+    """Stored wall-clock deadline, indexed together with status for resume and /cancel."""
+    conn.execute("ALTER TABLE jobs ADD COLUMN deadline REAL")
+    conn.execute("UPDATE jobs SET deadline = start_time + duration")
+    conn.execute("CREATE INDEX idx_jobs_status_deadline ON jobs (status, deadline)")
+
+
+def _migration_3(conn: sqlite3.Connection) -> None:
+    """Finished jobs keep their outcome until archived into jobs_history."""
+    conn.execute("ALTER TABLE jobs ADD COLUMN finished_at REAL")
+    conn.execute("ALTER TABLE jobs ADD COLUMN publish_skew REAL")
+    conn.execute('''
+        CREATE TABLE jobs_history (
+            id INTEGER PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            post_text TEXT,
+            media TEXT,
+            duration INTEGER NOT NULL,
+            start_time INTEGER NOT NULL,
+            deadline REAL,
+            status TEXT NOT NULL,
+            finished_at REAL NOT NULL,
+            publish_skew REAL
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_jobs_history_finished_at ON jobs_history (finished_at)")
+
+
+def _migration_4(conn: sqlite3.Connection) -> None:
+    """Per-channel listing of active jobs for the /cancel picker."""
+    conn.execute("CREATE INDEX idx_jobs_status_chat_deadline ON jobs (status, chat_id, deadline)")
+
+
+def _migration_5(conn: sqlite3.Connection) -> None:
+    """Board message of each channel in dashboard mode."""
+    conn.execute("CREATE TABLE dashboards (chat_id INTEGER PRIMARY KEY, message_id INTEGER NOT NULL)")
+
+
+def _migration_6(conn: sqlite3.Connection) -> None:
+    """Leases: the worker process running a job and until when its claim holds."""
+    conn.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+    conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+    conn.execute("CREATE INDEX idx_jobs_lease_owner ON jobs (lease_owner)")
+
+
+def _migration_7(conn: sqlite3.Connection) -> None:
+    """Publish outbox: due posts wait in status 'publishing' until Telegram accepts them."""
+    conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE jobs ADD COLUMN next_attempt REAL")
+    conn.execute("CREATE INDEX idx_jobs_status_next_attempt ON jobs (status, next_attempt)")
+
+
+def _migration_8(conn: sqlite3.Connection) -> None:
+    """Recurring schedules, indexed by when the countdown of their next run starts."""
+    conn.execute('''
+        CREATE TABLE schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            post_text TEXT,
+            media TEXT,
+            duration INTEGER NOT NULL,
+            spec TEXT NOT NULL,
+            next_run REAL NOT NULL,
+            next_start REAL NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_schedules_next_start ON schedules (next_start, id)")
+
+
+def _migration_9(conn: sqlite3.Connection) -> None:
+    """The user who scheduled each post, for fair sharing and per-user caps on active jobs."""
+    conn.execute("ALTER TABLE jobs ADD COLUMN user_id INTEGER")
+    conn.execute("ALTER TABLE jobs_history ADD COLUMN user_id INTEGER")
+    conn.execute("ALTER TABLE schedules ADD COLUMN user_id INTEGER")
+    conn.execute("CREATE INDEX idx_jobs_user_status ON jobs (user_id, status)")
+
+
+def _migration_10(conn: sqlite3.Connection) -> None:
+    """Text-prefix search of active jobs for /cancel <text>, on a lowercased head of the post."""
+    conn.execute(f"CREATE INDEX idx_jobs_status_text_key ON jobs (status, {TEXT_KEY}, deadline)")
+
+
+MIGRATIONS = [_migration_1, _migration_2, _migration_3, _migration_4, _migration_5, _migration_6, _migration_7,
+              _migration_8, _migration_9, _migration_10]
+
+# Terminal job states; rows in them are moved to jobs_history by JobStore.archive_finished
+FINISHED_STATUSES = ('published', 'cancelled', 'failed')
+
+
+class JobStore:
+    """
+    SQLite job store that never blocks the event loop.
+
+    A single long-lived connection in WAL mode is owned by a dedicated worker
+    thread; every query runs there through ``run_in_executor``. Writes issued
+    while a previous batch is still being committed are grouped into the next
+    transaction, so a burst of updates costs one commit instead of one each.
+
+    Several processes may share the database file. Each active job is leased
+    to one of them (``lease_owner`` until ``lease_until``); claims and renewals
+    are single UPDATE statements, so two processes never win the same job.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='jobstore')
+        self._conn = None
+        self._pending = []
+        self._flushing = None
+
+    # ---------- Lifecycle ----------
+    async def open(self) -> None:
+        await self._run(self._open)
+
+    async def close(self) -> None:
+        if self._flushing is not None:
+            await self._flushing
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+    def _open(self) -> None:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        self._migrate(conn)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Switching an existing file to incremental vacuum needs a one-off rebuild
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        self._conn = conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Bring the schema up to date; PRAGMA user_version records the applied migrations."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN")
+            try:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logging.info(f"Job store migrated to schema version {target}")
+
+    # ---------- Primitives ----------
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _timed(self, op: str, fn, *args):
+        started = time.monotonic()
+        try:
+            return await self._run(fn, *args)
+        finally:
+            DB_LATENCY.observe(time.monotonic() - started, op=op)
+
+    async def fetchall(self, sql: str, params=()) -> list:
+        return await self._timed('read', lambda: self._conn.execute(sql, params).fetchall())
+
+    async def fetchone(self, sql: str, params=()):
+        return await self._timed('read', lambda: self._conn.execute(sql, params).fetchone())
+
+    async def _write(self, sql: str, params=()):
+        """Queue a write for the next batched transaction; returns (lastrowid, rowcount)."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((sql, params, future))
+        if self._flushing is None:
+            self._flushing = asyncio.create_task(self._flush())
+        return await future
+
+    async def execute(self, sql: str, params=()) -> int:
+        """Run a write statement and return the number of affected rows."""
+        return (await self._write(sql, params))[1]
+
+    async def insert(self, sql: str, params=()) -> int:
+        """Run an INSERT and return the new row id."""
+        return (await self._write(sql, params))[0]
+
+    async def _flush(self) -> None:
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, []
+                results = await self._timed('write', self._write_batch, [(sql, params) for sql, params, _ in batch])
+                for (_, _, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            self._flushing = None
+
+    def _write_batch(self, statements: list) -> list:
+        try:
+            with self._conn:
+                return [self._apply(sql, params) for sql, params in statements]
+        except sqlite3.Error:
+            if len(statements) == 1:
+                return [self._apply_single(*statements[0])]
+            # Fall back to one transaction per statement so a single bad
+            # write does not fail the rest of the batch.
+            logging.warning("Batched write failed, retrying %d statements one by one", len(statements))
+            return [self._apply_single(sql, params) for sql, params in statements]
+
+    def _apply(self, sql: str, params):
+        cursor = self._conn.execute(sql, params)
+        return cursor.lastrowid, cursor.rowcount
+
+    def _apply_single(self, sql: str, params):
+        try:
+            with self._conn:
+                return self._apply(sql, params)
+        except sqlite3.Error as e:
+            return e
+
+    # ---------- Jobs ----------
+    async def add_job(self, chat_id, message_id, post_text, media, duration, start_time,
+                      lease_owner: str = None, lease_until: float = None, user_id: int = None) -> int:
+        """Insert an active job, leased to ``lease_owner`` if given (unleased jobs wait for a worker to claim them)."""
+        return await self.insert(
+            "INSERT INTO jobs (chat_id, message_id, post_text, media, duration, start_time, deadline, status, "
+            "lease_owner, lease_until, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, 'active', ?, ?, ?)",
+            (chat_id, message_id, post_text, json.dumps(media), duration, start_time, start_time + duration,
+             lease_owner, lease_until, user_id)
+        )
+
+    async def add_jobs(self, jobs: list, lease_owner: str = None, lease_until: float = None,
+                       user_id: int = None) -> list:
+        """
+        Insert many jobs of one user in one transaction.
+        :param jobs: (chat_id, message_id, post_text, media, duration, start_time) tuples
+        :return: The new row ids, in order
+        """
+        rows = [
+            (chat_id, message_id, post_text, json.dumps(media), duration, start_time, start_time + duration,
+             lease_owner, lease_until, user_id)
+            for chat_id, message_id, post_text, media, duration, start_time in jobs
+        ]
+        return await self._timed('write', self._insert_many, rows)
+
+    def _insert_many(self, rows: list) -> list:
+        with self._conn:
+            return [self._conn.execute(
+                "INSERT INTO jobs (chat_id, message_id, post_text, media, duration, start_time, deadline, status, "
+                "lease_owner, lease_until, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, 'active', ?, ?, ?)", row
+            ).lastrowid for row in rows]
+
+    async def set_message_id(self, job_id: int, message_id: int) -> bool:
+        """
+        Record the bar message of a job still counting down.
+        :return: False if the job was cancelled (or finished) meanwhile
+        """
+        return bool(await self.execute(
+            "UPDATE jobs SET message_id = ? WHERE id = ? AND status = 'active'", (message_id, job_id)
+        ))
+
+    async def finish_job(self, job_id: int, status: str, publish_skew: float = None) -> bool:
+        """
+        Move an active or publishing job into a terminal state; archive_finished later moves it to history.
+        :return: False if the job was already finished or is unknown
+        """
+        return bool(await self.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, publish_skew = ? "
+            "WHERE id = ? AND status IN ('active', 'publishing')",
+            (status, time.time(), publish_skew, job_id)
+        ))
+
+    async def cancel_job(self, job_id: int) -> bool:
+        """
+        Cancel a job that is still counting down; once in the outbox a post can no longer be cancelled.
+        :return: False if the job is not active
+        """
+        return bool(await self.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'active'",
+            (time.time(), job_id)
+        ))
+
+    async def count_active_jobs(self, user_id: int) -> int:
+        """Jobs of a user still counting down or waiting in the outbox."""
+        row = await self.fetchone(
+            "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN ('active', 'publishing')", (user_id,)
+        )
+        return row[0]
+
+    async def get_job(self, job_id: int):
+        return await self.fetchone(
+            "SELECT chat_id, message_id, post_text FROM jobs WHERE id = ? AND status = 'active'", (job_id,)
+        )
+
+    async def page_active_jobs(self, anchor: tuple, limit: int, forward: bool = True,
+                               chat_id=None, text_prefix: str = None) -> list:
+        """
+        One page of active jobs next to ``anchor`` in (deadline, id) order, for the /cancel picker.
+        Keyset paging over the status/deadline indexes, so any page costs the same.
+        :param anchor: (deadline, id) the page starts after (forward) or ends before (backward)
+        :param chat_id: Only jobs of this channel
+        :param text_prefix: Only posts starting with this text (case-insensitive for ASCII). Matches
+            are found through the text-key index and sorted, so the cost follows their number
+            rather than the number of active jobs
+        :return: Rows (id, chat_id, post_text, start_time, duration, deadline), soonest first
+        """
+        where = ["status = 'active'", "(deadline, id) > (?, ?)" if forward else "(deadline, id) < (?, ?)"]
+        params = list(anchor)
+        if chat_id is not None:
+            where.append("chat_id = ?")
+            params.append(chat_id)
+        if text_prefix:
+            # Range on the indexed key (prefixes past its 64 characters are narrowed by LIKE alone)
+            where.append(f"{TEXT_KEY} >= lower(substr(?, 1, 64)) "
+                         f"AND {TEXT_KEY} < lower(substr(?, 1, 64)) || char(1114111)")
+            params += [text_prefix, text_prefix]
+            escaped = text_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where.append("post_text LIKE ? ESCAPE '\\'")
+            params.append(escaped + '%')
+        order = "deadline, id" if forward else "deadline DESC, id DESC"
+        # Without statistics the planner would walk the deadline index past every non-matching job
+        index = " INDEXED BY idx_jobs_status_text_key" if text_prefix else ""
+        rows = await self.fetchall(
+            f"SELECT id, chat_id, post_text, start_time, duration, deadline FROM jobs{index} "
+            f"WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?",
+            (*params, limit)
+        )
+        return rows if forward else rows[::-1]
+
+    # ---------- Leases ----------
+    async def claim_jobs(self, owner: str, now: float, lease_until: float, limit: int,
+                         after: tuple = (-math.inf, 0), reclaim_before: float = None, preview: int = 64) -> list:
+        """
+        Lease up to ``limit`` active jobs that no worker holds (never leased, or lease
+        expired before ``now``) to ``owner``, in (deadline, id) order so overdue posts come first.
+        :param after: (deadline, id) of the last job of the previous page
+        :param reclaim_before: Also take jobs ``owner`` still holds that started before this time
+            (left by its previous run, on restart); jobs it started since are already running
+        :param preview: Characters of the post text returned; claim_publish returns the full post
+        :return: Rows (id, chat_id, message_id, text preview, duration, start_time, deadline, user_id)
+        """
+        return await self._timed('write', self._claim, owner, now, lease_until, limit, after, reclaim_before,
+                                 preview)
+
+    def _claim(self, owner: str, now: float, lease_until: float, limit: int, after: tuple, reclaim_before: float,
+               preview: int) -> list:
+        if reclaim_before is None:
+            free, params = "(lease_until IS NULL OR lease_until < ?)", (now,)
+        else:
+            free = "(lease_until IS NULL OR lease_until < ? OR (lease_owner = ? AND start_time < ?))"
+            params = (now, owner, reclaim_before)
+        with self._conn:
+            rows = self._conn.execute(
+                "UPDATE jobs SET lease_owner = ?, lease_until = ? WHERE id IN ("
+                "SELECT id FROM jobs WHERE status = 'active' AND (deadline, id) > (?, ?) "
+                f"AND {free} ORDER BY deadline, id LIMIT ?) "
+                "RETURNING id, chat_id, message_id, substr(post_text, 1, ?), duration, start_time, deadline, user_id",
+                (owner, lease_until, *after, *params, limit, preview)
+            ).fetchall()
+        # RETURNING gives no order guarantee
+        return sorted(rows, key=lambda row: (row[6], row[0]))
+
+    async def renew_leases(self, owner: str, lease_until: float, job_ids) -> set:
+        """
+        Extend the leases ``owner`` holds on the given active or publishing jobs (the worker
+        heartbeat). Jobs it holds but no longer runs are left to expire and be claimed again.
+        :param job_ids: Jobs running (or starting, or publishing) in the calling process
+        :return: Ids of the renewed jobs; running jobs missing here were cancelled or taken over
+        """
+        return await self._timed('write', self._renew, owner, lease_until, list(job_ids))
+
+    def _renew(self, owner: str, lease_until: float, job_ids: list) -> set:
+        held = set()
+        with self._conn:
+            # Chunked to stay below SQLite's limit on bound parameters
+            for start in range(0, len(job_ids), 500):
+                chunk = job_ids[start:start + 500]
+                held.update(row[0] for row in self._conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE lease_owner = ? AND status IN ('active', 'publishing') "
+                    f"AND id IN ({', '.join('?' * len(chunk))}) RETURNING id",
+                    (lease_until, owner, *chunk)
+                ))
+        return held
+
+    async def release_leases(self, owner: str) -> int:
+        """Give up ``owner``'s jobs (on shutdown) so other workers take them over without waiting for expiry."""
+        return await self.execute(
+            "UPDATE jobs SET lease_owner = NULL, lease_until = NULL "
+            "WHERE lease_owner = ? AND status IN ('active', 'publishing')",
+            (owner,)
+        )
+
+    # ---------- Publish outbox ----------
+    async def claim_publish(self, job_id: int, owner: str, lease_until: float, retry_at: float):
+        """
+        Move a due job ``owner`` still holds into the outbox (status 'publishing') and
+        read the post body, which running jobs do not keep in memory.
+        :param retry_at: When the outbox may retry if this attempt never reports back (e.g. a crash)
+        :return: (post_text, media), or None if the job was cancelled, finished or leased to another worker
+        """
+        row = await self._timed('write', self._claim_publish, job_id, owner, lease_until, retry_at)
+        return (row[0], json.loads(row[1]) if row[1] else None) if row else None
+
+    def _claim_publish(self, job_id: int, owner: str, lease_until: float, retry_at: float):
+        with self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'publishing', lease_until = ?, attempts = attempts + 1, next_attempt = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'active' RETURNING post_text, media",
+                (lease_until, retry_at, job_id, owner)
+            ).fetchone()
+
+    async def claim_outbox(self, owner: str, now: float, lease_until: float, retry_at: float, limit: int) -> list:
+        """
+        Lease up to ``limit`` outbox posts due for another attempt: those ``owner`` holds or
+        whose lease expired. Counts the attempt and defers the next one to ``retry_at``.
+        :return: Rows (id, chat_id, post_text, media, attempts, deadline, user_id), media decoded
+        """
+        rows = await self._timed('write', self._claim_outbox, owner, now, lease_until, retry_at, limit)
+        return [(job_id, chat_id, post_text, json.loads(media) if media else None, attempts, deadline, user_id)
+                for job_id, chat_id, post_text, media, attempts, deadline, user_id in rows]
+
+    def _claim_outbox(self, owner: str, now: float, lease_until: float, retry_at: float, limit: int) -> list:
+        with self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_owner = ?, lease_until = ?, attempts = attempts + 1, next_attempt = ? "
+                "WHERE id IN (SELECT id FROM jobs WHERE status = 'publishing' AND next_attempt <= ? "
+                "AND (lease_owner = ? OR lease_until IS NULL OR lease_until < ?) ORDER BY next_attempt LIMIT ?) "
+                "RETURNING id, chat_id, post_text, media, attempts, deadline, user_id",
+                (owner, lease_until, retry_at, now, owner, now, limit)
+            ).fetchall()
+
+    async def retry_publish(self, job_id: int, retry_at: float) -> None:
+        """Keep a post in the outbox until ``retry_at`` (its attempt failed, or is still in flight)."""
+        await self.execute(
+            "UPDATE jobs SET next_attempt = ? WHERE id = ? AND status = 'publishing'", (retry_at, job_id)
+        )
+
+    # ---------- Recurring schedules ----------
+    async def add_schedules(self, schedules: list, user_id: int = None) -> list:
+        """
+        Store recurring posts of one user in one transaction; nothing runs until their next countdown starts.
+        :param schedules: (chat_id, post_text, media, duration, spec, next_run) tuples
+        :return: The new schedule ids, in order
+        """
+        now = time.time()
+        rows = [(chat_id, post_text, json.dumps(media), duration, spec, next_run, next_run - duration, now, user_id)
+                for chat_id, post_text, media, duration, spec, next_run in schedules]
+        return await self._timed('write', self._insert_schedules, rows)
+
+    def _insert_schedules(self, rows: list) -> list:
+        with self._conn:
+            return [self._conn.execute(
+                "INSERT INTO schedules (chat_id, post_text, media, duration, spec, next_run, next_start, created_at, "
+                "user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+            ).lastrowid for row in rows]
+
+    async def remove_schedule(self, schedule_id: int) -> bool:
+        """Stop a recurring post; a countdown already started from it keeps running as an ordinary job."""
+        return bool(await self.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,)))
+
+    async def get_schedule(self, schedule_id: int):
+        return await self.fetchone("SELECT chat_id, post_text, spec, next_run FROM schedules WHERE id = ?",
+                                   (schedule_id,))
+
+    async def page_schedules(self, after: tuple, limit: int) -> list:
+        """
+        One page of schedules after ``after`` in (next_start, id) order, for the /schedules list.
+        :return: Rows (id, chat_id, post_text, spec, next_run, next_start)
+        """
+        return await self.fetchall(
+            "SELECT id, chat_id, post_text, spec, next_run, next_start FROM schedules "
+            "WHERE (next_start, id) > (?, ?) ORDER BY next_start, id LIMIT ?",
+            (*after, limit)
+        )
+
+    async def expand_schedules(self, now: float, advance, owner: str, lease_until: float, limit: int,
+                               preview: int = 64) -> list:
+        """
+        Turn up to ``limit`` schedules whose countdown has started (next_start <= ``now``)
+        into active jobs leased to ``owner``, and move each schedule on to its following run.
+        Only the index range of due schedules is read, however many there are in total.
+        :param advance: ``advance(spec, next_run, now)`` returning the following run, or None
+                        if the schedule never runs again (it is then removed)
+        :return: Rows of the new jobs, shaped like those of claim_jobs
+        """
+        return await self._timed('write', self._expand, now, advance, owner, lease_until, limit, preview)
+
+    def _expand(self, now: float, advance, owner: str, lease_until: float, limit: int, preview: int) -> list:
+        due = self._conn.execute(
+            "SELECT id, chat_id, post_text, media, duration, spec, next_run, user_id FROM schedules "
+            "WHERE next_start <= ? ORDER BY next_start, id LIMIT ?",
+            (now, limit)
+        ).fetchall()
+        jobs = []
+        with self._conn:
+            for schedule_id, chat_id, post_text, media, duration, spec, next_run, user_id in due:
+                following = advance(spec, next_run, now)
+                # Matching on next_run makes the step compare-and-set: another process
+                # expanding the same run at the same time changes no row and adds no job
+                if following is None:
+                    taken = self._conn.execute(
+                        "DELETE FROM schedules WHERE id = ? AND next_run = ?", (schedule_id, next_run)
+                    ).rowcount
+                else:
+                    taken = self._conn.execute(
+                        "UPDATE schedules SET next_run = ?, next_start = ? WHERE id = ? AND next_run = ?",
+                        (following, following - duration, schedule_id, next_run)
+                    ).rowcount
+                if not taken:
+                    continue
+                start_time = next_run - duration
+                job_id = self._conn.execute(
+                    "INSERT INTO jobs (chat_id, message_id, post_text, media, duration, start_time, deadline, "
+                    "status, lease_owner, lease_until, user_id) VALUES (?, 0, ?, ?, ?, ?, ?, 'active', ?, ?, ?)",
+                    (chat_id, post_text, media, duration, start_time, next_run, owner, lease_until, user_id)
+                ).lastrowid
+                jobs.append((job_id, chat_id, 0, (post_text or '')[:preview], duration, start_time, next_run,
+                             user_id))
+        return jobs
+
+    # ---------- Dashboards ----------
+    async def list_dashboards(self) -> list:
+        """:return: Rows (chat_id, message_id) of every stored dashboard message"""
+        return await self.fetchall("SELECT chat_id, message_id FROM dashboards")
+
+    async def set_dashboard(self, chat_id, message_id: int) -> None:
+        await self.execute(
+            "INSERT OR REPLACE INTO dashboards (chat_id, message_id) VALUES (?, ?)", (chat_id, message_id)
+        )
+
+    async def remove_dashboard(self, chat_id) -> None:
+        await self.execute("DELETE FROM dashboards WHERE chat_id = ?", (chat_id,))
+
+    # ---------- History ----------
+    async def archive_finished(self, batch_size: int, purge_before: float = None, vacuum_pages: int = 1000):
+        """
+        Move up to ``batch_size`` finished jobs into jobs_history in one transaction,
+        drop up to ``batch_size`` history rows finished before ``purge_before``, and
+        hand freed pages back to the OS.
+        :return: (moved, purged) row counts
+        """
+        return await self._timed('archive', self._archive, batch_size, purge_before, vacuum_pages)
+
+    def _archive(self, batch_size: int, purge_before, vacuum_pages: int):
+        conn = self._conn
+        marks = ','.join('?' * len(FINISHED_STATUSES))
+        ids = [row[0] for row in conn.execute(
+            f"SELECT id FROM jobs WHERE status IN ({marks}) ORDER BY id LIMIT ?",
+            (*FINISHED_STATUSES, batch_size)
+        )]
+        purged = 0
+        with conn:
+            if ids:
+                id_marks = ','.join('?' * len(ids))
+                conn.execute(
+                    "INSERT INTO jobs_history (id, chat_id, post_text, media, duration, start_time, deadline, "
+                    "status, finished_at, publish_skew, user_id) "
+                    "SELECT id, chat_id, post_text, media, duration, start_time, deadline, "
+                    f"status, finished_at, publish_skew, user_id FROM jobs WHERE id IN ({id_marks})",
+                    ids
+                )
+                conn.execute(f"DELETE FROM jobs WHERE id IN ({id_marks})", ids)
+            if purge_before is not None:
+                purged = conn.execute(
+                    "DELETE FROM jobs_history WHERE id IN "
+                    "(SELECT id FROM jobs_history WHERE finished_at < ? ORDER BY finished_at LIMIT ?)",
+                    (purge_before, batch_size)
+                ).rowcount
+        if ids or purged:
+            # executescript steps the pragma to completion; execute() frees a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)});")
+        return len(ids), purged
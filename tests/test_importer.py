@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import importer
+from importer import parse_import
+
+NOW = 1_700_000_000.0
+CHANNELS = [-100, -200]
+
+
+def parse_chat_id(value: str):
+    value = value.strip()
+    return int(value) if value.lstrip('-').isdigit() else value
+
+
+def run(rows, filename='posts.json'):
+    data = rows if isinstance(rows, bytes) else json.dumps(rows).encode()
+    return parse_import(filename, data, CHANNELS[0], CHANNELS, parse_chat_id, NOW)
+
+
+def test_minutes_and_default_channel():
+    posts, errors = run([{'text': 'hello', 'minutes': 2.5}])
+    assert errors == []
+    assert (posts[0].chat_id, posts[0].post_text, posts[0].duration) == (-100, 'hello', 150)
+
+
+def test_at_as_unix_time_and_iso_without_offset_is_utc():
+    posts, errors = run([{'text': 'a', 'at': NOW + 60}, {'text': 'b', 'at': '2023-11-14T22:14:20'}])
+    assert errors == []
+    assert [post.duration for post in posts] == [60, 60]
+
+
+def test_csv_with_photo_and_channel():
+    data = b'text,photo,minutes,channel\n,AgACphoto,1,-200\n'
+    posts, errors = run(data, 'posts.csv')
+    assert errors == []
+    assert posts[0].chat_id == -200
+    assert posts[0].media == {'type': 'photo', 'file_id': 'AgACphoto'}
+
+
+@pytest.mark.parametrize('row, message', [
+    ({'minutes': 1}, "needs 'text' or 'photo'"),
+    ({'text': 'x'}, "exactly one of 'minutes' or 'at'"),
+    ({'text': 'x', 'minutes': 1, 'at': NOW + 60}, "exactly one of 'minutes' or 'at'"),
+    ({'text': 'x', 'minutes': -1}, "must be in the future"),
+    ({'text': 'x', 'at': NOW}, "must be in the future"),
+    ({'text': 'x', 'minutes': 'inf'}, "out of range"),
+    ({'text': 'x', 'minutes': 'nan'}, "out of range"),
+    ({'text': 'x', 'minutes': 1, 'channel': '-300'}, "not configured"),
+    ({'text': 'x', 'repeat': 'every 6h'}, "'repeat' needs 'minutes'"),
+    ({'text': 'x', 'minutes': 1, 'repeat': 'every fortnight'}, "every 6h"),
+])
+def test_row_errors(row, message):
+    posts, errors = run([row])
+    assert posts == []
+    assert len(errors) == 1 and errors[0].startswith('#1: ') and message in errors[0]
+
+
+def test_huge_minutes_from_json_are_rejected():
+    posts, errors = run(b'[{"text": "x", "minutes": 1e400}]')
+    assert posts == [] and 'out of range' in errors[0]
+
+
+def test_one_bad_row_rejects_the_file():
+    posts, errors = run([{'text': 'ok', 'minutes': 1}, {'text': 'bad'}])
+    assert posts == [] and errors[0].startswith('#2: ')
+
+
+def test_repeat_is_normalized():
+    posts, errors = run([{'text': 'x', 'minutes': 5, 'repeat': '  Every   6H '}])
+    assert errors == [] and posts[0].repeat == 'every 6h'
+
+
+def test_posts_wrapper_object():
+    posts, errors = run({'posts': [{'text': 'x', 'minutes': 1}]})
+    assert errors == [] and len(posts) == 1
+
+
+@pytest.mark.parametrize('data', [b'not json', b'{"posts": 3}', b'[1, 2]'])
+def test_unreadable_files(data):
+    posts, errors = run(data)
+    assert posts == [] and errors[0].startswith('cannot read file')
+
+
+def test_limits(monkeypatch):
+    monkeypatch.setattr(importer, 'MAX_IMPORT_POSTS', 2)
+    posts, errors = run([{'text': 'x', 'minutes': 1}] * 3)
+    assert posts == [] and 'limit is 2' in errors[0]
+    assert run([]) == ([], ['file has no posts'])
@@ -0,0 +1,134 @@
+import datetime
+import zoneinfo
+
+import pytest
+
+from recurrence import parse_recurrence
+
+UTC = datetime.timezone.utc
+BERLIN = zoneinfo.ZoneInfo('Europe/Berlin')
+HOUR = 3600
+
+
+def ts(*args, tz=UTC, fold=0) -> float:
+    return datetime.datetime(*args, tzinfo=tz, fold=fold).timestamp()
+
+
+# ---------- every N ----------
+def test_interval_keeps_run_on_the_boundary():
+    every = parse_recurrence('every 6h')
+    assert every.next_after(0, 6 * HOUR) == 6 * HOUR
+    assert every.next_after(0, 6 * HOUR + 1) == 12 * HOUR
+
+
+def test_interval_is_always_after_previous():
+    every = parse_recurrence('every 30m')
+    assert every.next_after(100, 0) == 100 + 30 * 60
+    assert every.next_after(100, 100) == 100 + 30 * 60
+
+
+def test_interval_skips_missed_runs():
+    every = parse_recurrence('every 1 hour')
+    assert every.next_after(0, 5.5 * HOUR) == 6 * HOUR
+
+
+@pytest.mark.parametrize('spec', ['every 0h', 'every 5 weeks', 'every h', 'every -1m'])
+def test_interval_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_recurrence(spec)
+
+
+# ---------- daily ----------
+def test_daily_picks_next_time_of_day():
+    daily = parse_recurrence('daily 18:30, 09:00')
+    start = ts(2024, 6, 5, 10, 0)
+    assert daily.next_after(start, start) == ts(2024, 6, 5, 18, 30)
+    assert daily.next_after(ts(2024, 6, 5, 18, 30), 0) == ts(2024, 6, 6, 9, 0)
+
+
+def test_daily_keeps_run_on_the_boundary():
+    daily = parse_recurrence('daily 09:00')
+    assert daily.next_after(ts(2024, 6, 5, 8, 0), ts(2024, 6, 5, 9, 0)) == ts(2024, 6, 5, 9, 0)
+
+
+def test_daily_follows_wall_clock_across_spring_forward():
+    daily = parse_recurrence('daily 09:00', BERLIN)
+    # Clocks go forward on 2024-03-31: 09:00 moves from 08:00 to 07:00 UTC
+    assert daily.next_after(ts(2024, 3, 30, 9, 0, tz=BERLIN), 0) == ts(2024, 3, 31, 7, 0)
+
+
+def test_daily_time_skipped_by_spring_forward_still_runs():
+    daily = parse_recurrence('daily 02:30', BERLIN)
+    run = daily.next_after(ts(2024, 3, 30, 2, 30, tz=BERLIN), 0)
+    assert ts(2024, 3, 31, 0, 0) < run < ts(2024, 3, 31, 3, 0)
+
+
+def test_daily_time_repeated_by_fall_back_runs_once():
+    daily = parse_recurrence('daily 02:30', BERLIN)
+    first = daily.next_after(ts(2024, 10, 27, 1, 0, tz=BERLIN), 0)
+    assert first == ts(2024, 10, 27, 2, 30, tz=BERLIN)
+    assert daily.next_after(first, 0) == ts(2024, 10, 28, 2, 30, tz=BERLIN)
+
+
+def test_daily_inside_repeated_hour_never_goes_back():
+    daily = parse_recurrence('daily 02:30', BERLIN)
+    # From the second 02:15 the next 02:30 is the second one, an hour after the first
+    inside = ts(2024, 10, 27, 2, 15, tz=BERLIN, fold=1)
+    assert daily.next_after(inside, inside) == ts(2024, 10, 27, 2, 30, tz=BERLIN, fold=1)
+    cron = parse_recurrence('30 2 * * *', BERLIN)
+    assert cron.next_after(inside, inside) >= inside
+
+
+@pytest.mark.parametrize('spec', ['daily', 'daily 24:00', 'daily 9:60', 'daily noon'])
+def test_daily_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_recurrence(spec)
+
+
+# ---------- cron ----------
+@pytest.mark.parametrize('spec', ['0 9 * * 0', '0 9 * * 7', 'cron 0 9 * * 7'])
+def test_cron_sunday_is_0_and_7(spec):
+    # 2024-06-05 is a Wednesday
+    assert parse_recurrence(spec).next_after(ts(2024, 6, 5), 0) == ts(2024, 6, 9, 9, 0)
+
+
+def test_cron_day_and_weekday_either_matches_when_both_restricted():
+    # The 13th or a Friday: Friday 2024-06-07 comes first
+    assert parse_recurrence('0 9 13 * 5').next_after(ts(2024, 6, 1), 0) == ts(2024, 6, 7, 9, 0)
+
+
+def test_cron_step_day_is_unrestricted_for_the_or_rule():
+    # '*/2' starts with '*': odd days that are also Mondays, not odd days or Mondays
+    cron = parse_recurrence('0 9 */2 * 1')
+    first = cron.next_after(ts(2024, 6, 1), 0)
+    assert first == ts(2024, 6, 3, 9, 0)
+    assert cron.next_after(first, 0) == ts(2024, 6, 17, 9, 0)
+
+
+def test_cron_keeps_run_on_the_boundary():
+    cron = parse_recurrence('*/15 * * * *')
+    assert cron.next_after(ts(2024, 6, 5, 10, 0), ts(2024, 6, 5, 10, 15)) == ts(2024, 6, 5, 10, 15)
+    assert cron.next_after(ts(2024, 6, 5, 10, 15), 0) == ts(2024, 6, 5, 10, 30)
+
+
+@pytest.mark.parametrize('spec', ['0 0 30 2 *', '0 0 31 4 *'])
+def test_cron_impossible_date_never_runs(spec):
+    assert parse_recurrence(spec).next_after(ts(2024, 1, 1), 0) is None
+
+
+def test_cron_leap_day():
+    assert parse_recurrence('0 0 29 2 *').next_after(ts(2025, 1, 1), 0) == ts(2028, 2, 29)
+
+
+def test_cron_follows_wall_clock_across_fall_back():
+    cron = parse_recurrence('30 2 * * *', BERLIN)
+    first = cron.next_after(ts(2024, 10, 27, 1, 0, tz=BERLIN), 0)
+    assert first == ts(2024, 10, 27, 2, 30, tz=BERLIN)
+    assert cron.next_after(first, 0) == ts(2024, 10, 28, 2, 30, tz=BERLIN)
+
+
+@pytest.mark.parametrize('spec', ['60 * * * *', '* 24 * * *', '* * 0 * *', '* * * 13 *', '* * * * 8',
+                                  '* * * *', '5-1 * * * *', '*/0 * * * *', 'a * * * *', ''])
+def test_cron_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_recurrence(spec)
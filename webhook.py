@@ -0,0 +1,37 @@
+import hmac
+import json
+import logging
+
+from telegram import Update
+
+
+def make_webhook_handler(app, path: str, secret: str = None):
+    """
+    Build an HTTPServer handler that feeds Telegram webhook calls into ``app``.
+
+    Requests must be POSTs to ``path``; when ``secret`` is set they must also
+    carry it in the X-Telegram-Bot-Api-Secret-Token header. Accepted updates
+    are put on the application's update queue, exactly like polled ones.
+    """
+    expected = secret.encode() if secret else None
+
+    async def handle(method: str, target: str, headers: dict, body: bytes):
+        if target != path:
+            return 404, 'text/plain', b'not found'
+        if method != 'POST':
+            return 405, 'text/plain', b'method not allowed'
+        if expected is not None:
+            token = headers.get('x-telegram-bot-api-secret-token', '').encode()
+            if not hmac.compare_digest(token, expected):
+                return 403, 'text/plain', b'forbidden'
+        try:
+            update = Update.de_json(json.loads(body), app.bot)
+        except Exception as e:
+            logging.warning(f"Rejected malformed webhook update: {e}")
+            update = None
+        if update is None:
+            return 400, 'text/plain', b'bad update'
+        await app.update_queue.put(update)
+        return 200, 'text/plain', b'ok'
+
+    return handle